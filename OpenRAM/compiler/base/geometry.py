@@ -210,17 +210,21 @@ class instance(geometry):
             mirr = 1
             angle += math.radians(180.0)
 
+        # The module blockages are shared by all of its instances
+        (coords, lengths) = self.mod.get_blockage_coords(lpp)
+        x = coords[:, 0] * math.cos(angle) - coords[:, 1] * mirr * math.sin(angle) + self.offset[0]
+        y = coords[:, 0] * math.sin(angle) + coords[:, 1] * mirr * math.cos(angle) + self.offset[1]
+        points = np.column_stack((x, y))
+
+        if len(set(lengths)) == 1:
+            # All rectangles or all shapes with the same number of points
+            return points.reshape(len(lengths), lengths[0], 2).tolist()
+        points = points.tolist()
         new_blockages = []
-        if self.mod.is_library_cell:
-            # Writes library cell blockages as shapes instead of a large metal blockage
-            blockages = []
-            blockages = self.mod.gds.getBlockages(lpp)
-            for b in blockages:
-                new_blockages.append(self.transform_coords(b, self.offset, mirr, angle))
-        else:
-            blockages = self.mod.get_blockages(lpp)
-            for b in blockages:
-                new_blockages.append(self.transform_coords(b, self.offset, mirr, angle))
+        start = 0
+        for length in lengths:
+            new_blockages.append(points[start:start + length])
+            start += length
         return new_blockages
 
     def gds_write_file(self, new_layout):
@@ -243,6 +247,8 @@ class instance(geometry):
         self.mirror = mirror
         self.rotate = rotate
         self.update_boundary()
+        # The blockages of the parent modules move with the instance
+        self.mod.invalidate_blockages()
         debug.info(3, "placing instance {}".format(self))
 
     def get_pin(self, name, index=-1):
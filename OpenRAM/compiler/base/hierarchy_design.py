@@ -5,8 +5,11 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
+import os
+import multiprocessing
 import hierarchy_layout
 import hierarchy_spice
+import timing_graph
 import debug
 from globals import OPTS
 
@@ -52,13 +55,32 @@ class hierarchy_design(hierarchy_spice.spice, hierarchy_layout.layout):
         # Do not run if disabled in options.
         elif (OPTS.inline_lvsdrc or force_check or final_verification):
 
+            # Only the inline checks are scheduled since the others use the results
+            schedule = (OPTS.inline_lvsdrc_parallel
+                        and not force_check
+                        and not final_verification
+                        and not multiprocessing.current_process().daemon)
+            if schedule:
+                # Every scheduled cell is written to its own directory
+                temp_path = "{0}verify/{1}/".format(OPTS.openram_temp, self.cell_name)
+                os.makedirs(temp_path, exist_ok=True)
+            else:
+                temp_path = OPTS.openram_temp
+
             tempspice = "{}.sp".format(self.name)
-            self.sp_write("{0}{1}".format(OPTS.openram_temp, tempspice), lvs=True)
+            self.sp_write("{0}{1}".format(temp_path, tempspice), lvs=True)
             tempgds = "{}.gds".format(self.name)
-            self.gds_write("{0}{1}".format(OPTS.openram_temp, tempgds))
+            self.gds_write("{0}{1}".format(temp_path, tempgds))
+            if schedule:
+                verify.schedule_drc_lvs(self.cell_name, temp_path, tempgds, tempspice)
+                return
+
             # Final verification option does not allow nets to be connected by label.
-            self.drc_errors = verify.run_drc(self.cell_name, tempgds, tempspice, extract=True, final_verification=final_verification)
-            self.lvs_errors = verify.run_lvs(self.cell_name, tempgds, tempspice, final_verification=final_verification)
+            (self.drc_errors, self.lvs_errors) = verify.run_drc_lvs(self.cell_name,
+                                                                    tempgds,
+                                                                    tempspice,
+                                                                    extract=True,
+                                                                    final_verification=final_verification)
 
             # force_check is used to determine decoder height and other things, so we shouldn't fail
             # if that flag is set
@@ -85,7 +107,7 @@ class hierarchy_design(hierarchy_spice.spice, hierarchy_layout.layout):
             self.sp_write("{0}{1}".format(OPTS.openram_temp, tempspice), lvs=True)
             tempgds = "{}.gds".format(self.cell_name)
             self.gds_write("{0}{1}".format(OPTS.openram_temp, tempgds))
-            num_errors = verify.run_drc(self.cell_name, tempgds, tempspice, final_verification=final_verification)
+            num_errors = verify.cached_drc(self.cell_name, tempgds, tempspice, final_verification=final_verification)
             debug.check(num_errors == 0,
                         "DRC failed for {0} with {1} error(s)".format(self.cell_name,
                                                                       num_errors))
@@ -105,7 +127,7 @@ class hierarchy_design(hierarchy_spice.spice, hierarchy_layout.layout):
             self.sp_write("{0}{1}".format(OPTS.openram_temp, tempspice), lvs=True)
             tempgds = "{}.gds".format(self.name)
             self.gds_write("{0}{1}".format(OPTS.openram_temp, tempgds))
-            num_errors = verify.run_lvs(self.name, tempgds, tempspice, final_verification=final_verification)
+            num_errors = verify.cached_lvs(self.name, tempgds, tempspice, final_verification=final_verification)
             debug.check(num_errors == 0,
                         "LVS failed for {0} with {1} error(s)".format(self.cell_name,
                                                                       num_errors))
@@ -116,6 +138,9 @@ class hierarchy_design(hierarchy_spice.spice, hierarchy_layout.layout):
         """
         # Only initializes a set for checking instances which should not be added
         self.graph_inst_exclude = set()
+        # The timing graph records of the instances of this module
+        if not hasattr(self, "graph_records"):
+            self.graph_records = {}
 
     def build_graph(self, graph, inst_name, port_nets):
         """
@@ -136,6 +161,37 @@ class hierarchy_design(hierarchy_spice.spice, hierarchy_layout.layout):
             subinst_ports = self.translate_nets(conns, port_dict, inst_name)
             subinst.mod.build_graph(graph, subinst_name, subinst_ports)
 
+    def get_graph_record(self, inst_name, port_nets):
+        """
+        Returns the timing graph record of an instance of this module.
+        The record is kept so the graph of the instance is only
+        created once no matter which instances are excluded.
+        """
+        key = (inst_name, tuple(port_nets))
+        if key not in self.graph_records:
+            self.graph_records[key] = timing_graph.timing_graph_record(self, inst_name, port_nets)
+        return self.graph_records[key]
+
+    def record_graph(self, record):
+        """
+        Fills a timing graph record of an instance of this module with
+        the edges of a leaf module or the instances of a hierarchical module.
+        """
+        record.insts = []
+        # Leaf modules add their own edges instead of walking the instances
+        if type(self).build_graph is not hierarchy_design.build_graph:
+            self.build_graph(record, record.inst_name, record.port_nets)
+            return
+
+        # Translate port names to external nets
+        if len(record.port_nets) != len(self.pins):
+            debug.error("Port length mismatch:\nExt nets={}, Ports={}".format(record.port_nets,
+                                                                              self.pins),
+                        1)
+        record.port_dict = {pin: port for pin, port in zip(self.pins, record.port_nets)}
+        debug.info(3, "Instance name={}".format(record.inst_name))
+        record.insts = [[subinst, conns, None] for subinst, conns in zip(self.insts, self.conns)]
+
     def build_names(self, name_dict, inst_name, port_nets):
         """
         Collects all the nets and the parent inst of that net.
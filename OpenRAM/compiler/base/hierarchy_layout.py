@@ -16,10 +16,13 @@ from tech import layer_stacks
 from tech import preferred_directions
 import os
 import sys
+import pickle
+import hashlib
+import numpy as np
 from globals import OPTS
 from vector import vector
 from pin_layout import pin_layout
-from utils import round_to_grid
+from utils import round_to_grid, write_atomic
 try:
     from tech import special_purposes
 except ImportError:
@@ -35,6 +38,13 @@ class layout():
     generated, it should implement a constructor to create the
     layout/netlist and perform LVS/DRC.
     """
+    # This is incremented when the objs, insts or pins of any module
+    # change so that all of the cached blockages are recomputed.
+    blockage_version = 0
+    # The parsed library GDS files by (path, modification time, units).
+    # They are kept when the factory is reset and are never changed
+    # since every module gets its own copy.
+    gds_cache = {}
 
     def __init__(self, name, cell_name):
         # This gets set in both spice and layout so either can be called first.
@@ -51,6 +61,9 @@ class layout():
         self.insts = []
         # Set of names to check for duplicates
         self.inst_names = set()
+        # The first instance with each name and the position of each instance
+        self.inst_by_name = {}
+        self.inst_positions = {}
         # Holds all other objects (labels, geometries, etc)
         self.objs = []
         # This is a mapping of internal pin names to cell pin names
@@ -58,10 +71,12 @@ class layout():
         self.pin_names = {}
         # Holds name->pin_layout map for all pins
         self.pin_map = {}
-        # List of modules we have already visited
-        self.visited = []
+        # Set of modules we have already visited
+        self.visited = set()
         # Flag for library cells
         self.is_library_cell = False
+        # Holds the blockages by lpp with the blockage_version they were computed in
+        self.blockage_cache = {}
 
         self.gds_read()
 
@@ -224,6 +239,7 @@ class layout():
             pin_list = self.pin_map[pin_name]
             for pin in pin_list:
                 pin.rect = [pin.ll() - offset, pin.ur() - offset]
+        self.invalidate_blockages()
 
     def add_inst(self, name, mod, offset=[0, 0], mirror="R0", rotate=0):
         """ Adds an instance of a mod to this module """
@@ -233,18 +249,22 @@ class layout():
             debug.check(name not in self.inst_names, "Duplicate named instance in {0}: {1}".format(self.cell_name, name))
 
         self.inst_names.add(name)
-        self.insts.append(geometry.instance(name, mod, offset, mirror, rotate))
+        self.append_inst(geometry.instance(name, mod, offset, mirror, rotate))
+        self.invalidate_blockages()
         debug.info(3, "adding instance {}".format(self.insts[-1]))
         # This is commented out for runtime reasons
         # debug.info(4, "instance list: " + ",".join(x.name for x in self.insts))
         return self.insts[-1]
 
+    def append_inst(self, inst):
+        """ Appends an instance and indexes it by name and identity """
+        self.inst_by_name.setdefault(inst.name, inst)
+        self.inst_positions.setdefault(id(inst), len(self.insts))
+        self.insts.append(inst)
+
     def get_inst(self, name):
         """ Retrieve an instance by name """
-        for inst in self.insts:
-            if inst.name == name:
-                return inst
-        return None
+        return self.inst_by_name.get(name)
 
     def add_flat_inst(self, name, mod, offset=[0, 0]):
         """ Copies all of the items in instance into this module """
@@ -253,9 +273,10 @@ class layout():
             self.objs.append(item)
         for item in mod.insts:
             item.offset += offset
-            self.insts.append(item)
+            self.append_inst(item)
             debug.check(len(item.mod.pins) == 0, "Cannot add flat instance with subinstances.")
             self.connect_inst([])
+        self.invalidate_blockages()
         debug.info(3, "adding flat instance {}".format(name))
         return None
 
@@ -272,6 +293,7 @@ class layout():
                                             offset,
                                             width,
                                             height))
+        self.invalidate_blockages()
         return self.objs[-1]
 
     def add_rect_center(self, layer, offset, width=None, height=None):
@@ -289,6 +311,7 @@ class layout():
                                             corrected_offset,
                                             width,
                                             height))
+        self.invalidate_blockages()
         return self.objs[-1]
 
     def add_segment_center(self, layer, start, end, width=None):
@@ -468,12 +491,14 @@ class layout():
         Delete a labeled pin (or all pins of the same name)
         """
         self.pin_map[text] = set()
+        self.invalidate_blockages()
 
     def remove_layout_pins(self):
         """
         Delete all the layout pins
         """
         self.pin_map = {}
+        self.invalidate_blockages()
 
     def copy_layout_pin_shapes(self, text):
         """
@@ -522,6 +547,7 @@ class layout():
         except KeyError:
             self.pin_map[text] = set()
             self.pin_map[text].add(new_pin)
+        self.invalidate_blockages()
 
         return new_pin
 
@@ -549,6 +575,7 @@ class layout():
         debug.info(5, "add label " + str(text) + " " + layer + " " + str(offset))
         lpp = techlayer[layer]
         self.objs.append(geometry.label(text, lpp, offset, zoom))
+        self.invalidate_blockages()
         return self.objs[-1]
 
     def add_path(self, layer, coordinates, width=None):
@@ -779,13 +806,44 @@ class layout():
         # open the gds file if it exists or else create a blank layout
         if os.path.isfile(self.gds_file):
             debug.info(3, "opening {}".format(self.gds_file))
-            self.gds = gdsMill.VlsiLayout(units=GDS["unit"])
-            reader = gdsMill.Gds2reader(self.gds)
-            reader.loadFromFile(self.gds_file, special_purposes)
+            self.gds = self.load_library_gds(self.gds_file).copy()
         else:
             debug.info(3, "Creating layout structure {}".format(self.name))
             self.gds = gdsMill.VlsiLayout(name=self.name, units=GDS["unit"])
 
+    def load_library_gds(self, gds_file):
+        """
+        Return the parsed layout of a library GDS file. A file is only parsed
+        again when it changes. The layouts are also pickled in OPTS.gds_cache_path
+        so that later runs do not parse them. The pickles of another
+        gdsMill.PICKLE_VERSION are not loaded.
+        """
+        stat = os.stat(gds_file)
+        key = (os.path.realpath(gds_file), stat.st_mtime_ns, GDS["unit"])
+        if key in layout.gds_cache:
+            return layout.gds_cache[key]
+
+        cache_file = None
+        if OPTS.gds_cache_path:
+            h = hashlib.sha256("{0} {1} {2}".format(key,
+                                                    sorted(special_purposes.items()),
+                                                    gdsMill.PICKLE_VERSION).encode())
+            cache_file = os.path.join(OPTS.gds_cache_path, "{}.pkl".format(h.hexdigest()))
+
+        if cache_file and os.path.isfile(cache_file):
+            debug.info(3, "loading {}".format(cache_file))
+            with open(cache_file, "rb") as f:
+                layout.gds_cache[key] = pickle.load(f)
+        else:
+            gds = gdsMill.VlsiLayout(units=GDS["unit"])
+            reader = gdsMill.Gds2reader(gds)
+            reader.loadFromFile(gds_file, special_purposes)
+            layout.gds_cache[key] = gds
+            if cache_file:
+                write_atomic(cache_file, pickle.dumps(gds))
+
+        return layout.gds_cache[key]
+
     def print_gds(self, gds_file=None):
         """Print the gds file (not the vlsi class) to the terminal """
         if not gds_file:
@@ -797,13 +855,35 @@ class layout():
 
     def clear_visited(self):
         """ Recursively clear the visited flag """
-        self.visited = []
+        self.visited = set()
 
     def gds_write_file(self, gds_layout):
-        """Recursive GDS write function"""
+        """
+        Writes the GDS of this module and of the modules of its instances
+        that were not visited yet, deepest modules first. The hierarchy is
+        walked with a stack rather than recursion so that deep hierarchies
+        do not hit the recursion limit.
+        """
         # Visited means that we already prepared self.gds for this subtree
         if self.name in self.visited:
             return
+        stack = [(self, gds_layout, iter(self.insts))]
+        while stack:
+            (mod, mod_layout, insts) = stack[-1]
+            for inst in insts:
+                if inst.mod.name in inst.mod.visited:
+                    continue
+                stack.append((inst.mod, inst.gds, iter(inst.mod.insts)))
+                break
+            else:
+                stack.pop()
+                mod.gds_write_module(mod_layout)
+
+    def gds_write_module(self, gds_layout):
+        """
+        Writes the GDS of only this module. The modules of the
+        instances must already be visited.
+        """
         for i in self.insts:
             i.gds_write_file(gds_layout)
         for i in self.objs:
@@ -839,7 +919,7 @@ class layout():
                                   center=False)
                 debug.info(4, "Adding {0} boundary {1}".format(self.name, boundary))
 
-        self.visited.append(self.name)
+        self.visited.add(self.name)
 
     def gds_write(self, gds_name):
         """Write the entire gds of the object to the file."""
@@ -872,32 +952,71 @@ class layout():
         return [vector(0, 0), vector(self.width, self.height)]
         #return [self.find_lowest_coords(), self.find_highest_coords()]
 
+    def invalidate_blockages(self):
+        """
+        Invalidate the cached blockages of all the modules since
+        a change in this module changes the blockages of its parents.
+        """
+        layout.blockage_version += 1
+
+    def get_cached_blockages(self, key):
+        """ Return the cached blockages for a key or None if they are out of date. """
+        try:
+            (version, blockages) = self.blockage_cache[key]
+        except KeyError:
+            return None
+        if version != layout.blockage_version:
+            return None
+        return blockages
+
     def get_blockages(self, layer, top_level=False):
         """
         Write all of the obstacles in the current (and children)
         modules to the lef file.
         Do not write the pins since they aren't obstructions.
+        The blockages are cached until any layout changes.
         """
         if type(layer) == str:
             lpp = techlayer[layer]
         else:
             lpp = layer
 
-        blockages = []
-        for i in self.objs:
-            blockages += i.get_blockages(lpp)
-        for i in self.insts:
-            blockages += i.get_blockages(lpp)
-        # Must add pin blockages to non-top cells
-        if not top_level:
-            blockages += self.get_pin_blockages(lpp)
-        return blockages
+        blockages = self.get_cached_blockages((lpp, top_level))
+        if blockages is None:
+            blockages = []
+            for i in self.objs:
+                blockages += i.get_blockages(lpp)
+            for i in self.insts:
+                blockages += i.get_blockages(lpp)
+            # Must add pin blockages to non-top cells
+            if not top_level:
+                blockages += self.get_pin_blockages(lpp)
+            self.blockage_cache[(lpp, top_level)] = (layout.blockage_version, blockages)
+        return list(blockages)
+
+    def get_blockage_coords(self, lpp):
+        """
+        Return the blockages that an instance of this module has on a given
+        lpp as an array of all of their coordinates and a list with the
+        number of coordinates in each blockage. This is shared by all the
+        instances of the module.
+        """
+        blockage_coords = self.get_cached_blockages((lpp, "coords"))
+        if blockage_coords is None:
+            if self.is_library_cell:
+                # Library cell blockages are the shapes instead of a large metal blockage
+                blockages = self.gds.getBlockages(lpp)
+            else:
+                blockages = self.get_blockages(lpp)
+            coords = np.array([(c[0], c[1]) for b in blockages for c in b], dtype=float).reshape(-1, 2)
+            blockage_coords = (coords, [len(b) for b in blockages])
+            self.blockage_cache[(lpp, "coords")] = (layout.blockage_version, blockage_coords)
+        return blockage_coords
 
     def get_pin_blockages(self, lpp):
         """ Return the pin shapes as blockages for non-top-level blocks. """
         # FIXME: We don't have a body contact in ptx, so just ignore it for now
-        import copy
-        pin_names = copy.deepcopy(self.pins)
+        pin_names = list(self.pins)
         if self.name.startswith("pmos") or self.name.startswith("nmos"):
             pin_names.remove("B")
 
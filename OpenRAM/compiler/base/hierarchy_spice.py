@@ -9,6 +9,7 @@ import debug
 import re
 import os
 import math
+import numpy as np
 import tech
 from globals import OPTS
 from pprint import pformat
@@ -63,6 +64,8 @@ class spice():
         self.no_instances = False
         # If we are doing a trimmed netlist, these are the instance that will be filtered
         self.trim_insts = set()
+        # The generated subcircuit text by (lvs, trim) until the netlist changes
+        self.sp_cache = {}
         # Keep track of any comments to add the the spice
         try:
             self.commments
@@ -84,11 +87,13 @@ class spice():
             self.comments = []
 
         self.comments.append(comment)
+        self.invalidate_netlist()
 
     def add_pin(self, name, pin_type="INOUT"):
         """ Adds a pin to the pins list. Default type is INOUT signal. """
         self.pins.append(name)
         self.pin_type[name]=pin_type
+        self.invalidate_netlist()
         debug.check(pin_type in self.valid_signal_types,
                     "Invalid signaltype for {0}: {1}".format(name,
                                                              pin_type))
@@ -140,6 +145,7 @@ class spice():
                       \n Module names={}\
                       ".format(self.name, self.pins, type_list), 1)
         self.pin_type = {pin: type for pin, type in zip(self.pins, type_list)}
+        self.invalidate_netlist()
     
     def get_pin_type(self, name):
         """ Returns the type of the signal pin. """
@@ -221,6 +227,7 @@ class spice():
                         1)
 
         self.conns.append(ordered_args)
+        self.invalidate_netlist()
 
         # This checks if we don't have enough instance port connections for the number of insts
         if check and (len(self.insts)!=len(self.conns)):
@@ -236,11 +243,11 @@ class spice():
 
     def get_conns(self, inst):
         """Returns the connections of a given instance."""
-        for i in range(len(self.insts)):
-            if inst is self.insts[i]:
-                return self.conns[i]
+        index = self.inst_positions.get(id(inst))
         # If not found, returns None
-        return None
+        if index is None:
+            return None
+        return self.conns[index]
 
     def sp_read(self):
         """
@@ -306,39 +313,71 @@ class spice():
             nets_match = nets_match and self.check_net_in_spice(net)
         return nets_match
 
-    def contains(self, mod, modlist):
-        for x in modlist:
-            if x.name == mod.name:
-                return True
-        return False
-
     def sp_write_file(self, sp, usedMODS, lvs=False, trim=False):
         """
-        Recursive spice subcircuit write;
-        Writes the spice subcircuit from the library or the dynamically generated one.
+        Writes the spice subcircuits of this module and of the submodules
+        whose names are not in the usedMODS set, submodules first.
+        The hierarchy is walked with a stack rather than recursion so that
+        deep hierarchies do not hit the recursion limit.
         Trim netlist is intended ONLY for bitcell arrays.
         """
+        subckts = []
+        stack = [(self, iter(self.get_sp_submodules()))]
+        while stack:
+            (mod, submods) = stack[-1]
+            for submod in submods:
+                if submod.name in usedMODS:
+                    continue
+                usedMODS.add(submod.name)
+                stack.append((submod, iter(submod.get_sp_submodules())))
+                break
+            else:
+                stack.pop()
+                subckts.append(mod.get_sp_subckt(lvs, trim))
+        # Write all of the subcircuits at once
+        sp.write("".join(subckts))
+
+    def get_sp_submodules(self):
+        """ Returns the submodules whose subcircuits are needed by this one. """
+        # Library cells and modules without instances don't use the submodules
+        if self.no_instances or self.spice:
+            return []
+        return self.mods
+
+    def invalidate_netlist(self):
+        """ Clears the cached subcircuit text when the netlist changes. """
+        self.sp_cache = {}
+
+    def get_sp_subckt(self, lvs=False, trim=False):
+        """
+        Returns the spice subcircuit of only this module. It is only
+        generated again when the netlist changes.
+        """
+        key = (bool(lvs), bool(trim))
+        if key not in self.sp_cache:
+            self.sp_cache[key] = self.create_sp_subckt(lvs, trim)
+        return self.sp_cache[key]
+
+    def create_sp_subckt(self, lvs=False, trim=False):
+        """
+        Generates the spice subcircuit of only this module
+        from the library or the dynamically generated one.
+        """
 
+        sp = []
         if self.no_instances:
-            return
+            return ""
         elif not self.spice:
             # If spice isn't defined, we dynamically generate one.
 
-            # recursively write the modules
-            for i in self.mods:
-                if self.contains(i, usedMODS):
-                    continue
-                usedMODS.append(i)
-                i.sp_write_file(sp, usedMODS, lvs, trim)
-
             if len(self.insts) == 0:
-                return
+                return ""
             if self.pins == []:
-                return
+                return ""
 
             # write out the first spice line (the subcircuit)
-            sp.write("\n.SUBCKT {0} {1}\n".format(self.cell_name,
-                                                  " ".join(self.pins)))
+            sp.append("\n.SUBCKT {0} {1}\n".format(self.cell_name,
+                                                   " ".join(self.pins)))
 
             # write a PININFO line
             pin_info = "*.PININFO"
@@ -349,14 +388,14 @@ class spice():
                     pin_info += " {0}:O".format(pin)
                 else:
                     pin_info += " {0}:B".format(pin)
-            sp.write(pin_info + "\n")
+            sp.append(pin_info + "\n")
 
             # Also write pins as comments
             for pin in self.pins:
-                sp.write("* {1:6}: {0} \n".format(pin, self.pin_type[pin]))
+                sp.append("* {1:6}: {0} \n".format(pin, self.pin_type[pin]))
 
             for line in self.comments:
-                sp.write("* {}\n".format(line))
+                sp.append("* {}\n".format(line))
 
             # every instance must have a set of connections, even if it is empty.
             if len(self.insts) != len(self.conns):
@@ -367,34 +406,31 @@ class spice():
                 debug.error("-----")
                 debug.error("Connections: \n" + str(self.conns), 1)
 
-            for i in range(len(self.insts)):
+            for (inst, conns) in zip(self.insts, self.conns):
                 # we don't need to output connections of empty instances.
                 # these are wires and paths
-                if self.conns[i] == []:
+                if conns == []:
                     continue
-                
+
                 # Instance with no devices in it needs no subckt/instance
-                if self.insts[i].mod.no_instances:
+                if inst.mod.no_instances:
                     continue
-                
+
                 # If this is a trimmed netlist, skip it by adding comment char
-                if trim and self.insts[i].name in self.trim_insts:
-                    sp.write("* ")
-                    
-                if lvs and hasattr(self.insts[i].mod, "lvs_device"):
-                    sp.write(self.insts[i].mod.lvs_device.format(self.insts[i].name,
-                                                                   " ".join(self.conns[i])))
-                    sp.write("\n")
-                elif hasattr(self.insts[i].mod, "spice_device"):
-                    sp.write(self.insts[i].mod.spice_device.format(self.insts[i].name,
-                                                                   " ".join(self.conns[i])))
-                    sp.write("\n")
+                if trim and inst.name in self.trim_insts:
+                    prefix = "* "
+                else:
+                    prefix = ""
+
+                if lvs and hasattr(inst.mod, "lvs_device"):
+                    line = inst.mod.lvs_device.format(inst.name, " ".join(conns))
+                elif hasattr(inst.mod, "spice_device"):
+                    line = inst.mod.spice_device.format(inst.name, " ".join(conns))
                 else:
-                    sp.write("X{0} {1} {2}\n".format(self.insts[i].name,
-                                                     " ".join(self.conns[i]),
-                                                     self.insts[i].mod.cell_name))
+                    line = "X{0} {1} {2}".format(inst.name, " ".join(conns), inst.mod.cell_name)
+                sp.append(prefix + line + "\n")
 
-            sp.write(".ENDS {0}\n".format(self.cell_name))
+            sp.append(".ENDS {0}\n".format(self.cell_name))
 
         else:
             # If spice is a hard module, output the spice file contents.
@@ -402,18 +438,20 @@ class spice():
             # if os.path.isfile(self.sp_file):
             #    sp.write("\n* {0}\n".format(self.sp_file))
             if lvs and hasattr(self, "lvs"):
-                sp.write("\n".join(self.lvs))
+                sp.append("\n".join(self.lvs))
             else:
-                sp.write("\n".join(self.spice))
+                sp.append("\n".join(self.spice))
+
+            sp.append("\n")
 
-            sp.write("\n")
+        return "".join(sp)
 
     def sp_write(self, spname, lvs=False, trim=False):
         """Writes the spice to files"""
         debug.info(3, "Writing to {0}".format(spname))
         spfile = open(spname, 'w')
         spfile.write("*FIRST LINE IS A COMMENT\n")
-        usedMODS = list()
+        usedMODS = set()
         self.sp_write_file(spfile, usedMODS, lvs=lvs, trim=trim)
         del usedMODS
         spfile.close()
@@ -543,14 +581,15 @@ class spice():
         if inputramptime == 0 and vs1 == vs2:
             return tf * (-math.log(vs1) if vs1 < 1 else math.log(vs1))
 
+        # The time constant may be an array of the loads of a timing table
         a = inputramptime / tf
         if rise == True:
             b = 0.5
-            td = tf * math.sqrt(math.log(vs1)*math.log(vs1) + 2*a*b*(1.0 - vs1)) + tf*(math.log(vs1) - math.log(vs2))
+            td = tf * np.sqrt(math.log(vs1)*math.log(vs1) + 2*a*b*(1.0 - vs1)) + tf*(math.log(vs1) - math.log(vs2))
 
         else:
             b = 0.4
-            td = tf * math.sqrt(math.log(1.0 - vs1)*math.log(1.0 - vs1) + 2*a*b*(vs1)) + tf*(math.log(1.0 - vs1) - math.log(1.0 - vs2))
+            td = tf * np.sqrt(math.log(1.0 - vs1)*math.log(1.0 - vs1) + 2*a*b*(vs1)) + tf*(math.log(1.0 - vs1) - math.log(1.0 - vs2))
 
         return td
   
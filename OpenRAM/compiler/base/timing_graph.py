@@ -1,6 +1,7 @@
-import copy
 from collections import defaultdict
+import numpy as np
 import debug
+from globals import OPTS
 
 
 class timing_graph():
@@ -13,6 +14,8 @@ class timing_graph():
         self.graph = defaultdict(set)
         self.all_paths = []
         self.edge_mods = {}
+        # The paths found for each (source, destination, reduced) until the graph changes
+        self.path_cache = {}
 
     def add_edge(self, src_node, dest_node, edge_mod):
         """Adds edge to graph. Nodes added as well if they do not exist.
@@ -22,6 +25,7 @@ class timing_graph():
         dest_node = dest_node.lower()
         self.graph[src_node].add(dest_node)
         self.edge_mods[(src_node, dest_node)] = edge_mod
+        self.path_cache = {}
 
     def add_node(self, node):
         """Add node to graph with no edges"""
@@ -34,6 +38,8 @@ class timing_graph():
         """Helper function to remove edges, useful for removing vdd/gnd"""
 
         node = node.lower()
+        if self.graph[node]:
+            self.path_cache = {}
         self.graph[node] = set()
 
     def get_all_paths(self, src_node, dest_node, remove_rail_nodes=True, reduce_paths=True):
@@ -49,48 +55,86 @@ class timing_graph():
             self.remove_edges('vdd')
             self.remove_edges('gnd')
 
-        # Mark all the vertices as not visited
-        visited = set()
+        key = (src_node, dest_node, reduce_paths)
+        if key not in self.path_cache:
+            self.all_paths = []
+            # Only the nodes that reach the destination can be on a path
+            reaching_nodes = self.get_reaching_nodes(dest_node)
+            if src_node in reaching_nodes:
+                self.get_all_paths_util(src_node, dest_node, reaching_nodes)
+            debug.info(2, "Paths found={}".format(len(self.all_paths)))
 
-        # Create an array to store paths
-        path = []
-        self.all_paths = []
-
-        # Call the recursive helper function to print all paths
-        self.get_all_paths_util(src_node, dest_node, visited, path)
-        debug.info(2, "Paths found={}".format(len(self.all_paths)))
+            if reduce_paths:
+                self.reduce_paths()
 
-        if reduce_paths:
-            self.reduce_paths()
+            self.path_cache[key] = self.all_paths
 
+        # Copy the paths so that the cached ones can't be changed
+        self.all_paths = [list(path) for path in self.path_cache[key]]
         return self.all_paths
 
-    def reduce_paths(self):
-        """ Remove any path that is a subset of another path """
-
-        self.all_paths = [p1 for p1 in self.all_paths if not any(set(p1)<=set(p2) for p2 in self.all_paths if p1 is not p2)]
+    def get_reaching_nodes(self, dest_node):
+        """Return the set of nodes that have a path to the destination"""
 
-    def get_all_paths_util(self, cur_node, dest_node, visited, path):
-        """Recursive function to find all paths in a Depth First Search manner"""
+        reverse_graph = defaultdict(list)
+        for (node, fanouts) in self.graph.items():
+            for fanout in fanouts:
+                reverse_graph[fanout].append(node)
 
-        # Mark the current node as visited and store in path
-        visited.add(cur_node)
-        path.append(cur_node)
+        reaching_nodes = {dest_node}
+        stack = [dest_node]
+        while stack:
+            for node in reverse_graph[stack.pop()]:
+                if node not in reaching_nodes:
+                    reaching_nodes.add(node)
+                    stack.append(node)
+        return reaching_nodes
 
-        # If current vertex is same as destination, then print
-        # current path[]
-        if cur_node == dest_node:
-            self.all_paths.append(copy.deepcopy(path))
-        else:
-            # If current vertex is not destination
-            # Recur for all the vertices adjacent to this vertex
-            for node in self.graph[cur_node]:
-                if node not in visited:
-                    self.get_all_paths_util(node, dest_node, visited, path)
+    def reduce_paths(self):
+        """ Remove any path that is a subset of another path """
 
-        # Remove current vertex from path[] and mark it as unvisited
-        path.pop()
-        visited.remove(cur_node)
+        path_sets = [frozenset(path) for path in self.all_paths]
+        # The paths through each node
+        node_paths = defaultdict(list)
+        for (index, path_set) in enumerate(path_sets):
+            for node in path_set:
+                node_paths[node].append(index)
+
+        # A superset of a path goes through its node with the fewest paths
+        reduced_paths = []
+        for (index, path_set) in enumerate(path_sets):
+            node = min(path_set, key=lambda x: len(node_paths[x]))
+            if not any(path_set <= path_sets[other] for other in node_paths[node] if other != index):
+                reduced_paths.append(self.all_paths[index])
+        self.all_paths = reduced_paths
+
+    def get_all_paths_util(self, src_node, dest_node, reaching_nodes):
+        """Find all paths in a Depth First Search manner through the nodes that reach the destination"""
+
+        # The current path and an iterator over the fanouts of each node on it
+        path = [src_node]
+        visited = {src_node}
+        if src_node == dest_node:
+            self.all_paths.append(list(path))
+            return
+
+        fanouts = [iter(self.graph[src_node])]
+        while fanouts:
+            for node in fanouts[-1]:
+                if node in visited or node not in reaching_nodes:
+                    continue
+                # If current vertex is same as destination, store the path
+                if node == dest_node:
+                    self.all_paths.append(path + [node])
+                    continue
+                path.append(node)
+                visited.add(node)
+                fanouts.append(iter(self.graph[node]))
+                break
+            else:
+                # Remove current vertex from path[] and mark it as unvisited
+                fanouts.pop()
+                visited.remove(path.pop())
 
     def get_timing(self, path, corner, slew, load, params):
         """Returns the analytical delays in the input path"""
@@ -105,32 +149,82 @@ class timing_graph():
             path_edge_mod = self.edge_mods[(path[i], path[i + 1])]
 
             # On the output of the current stage, get COUT from all other mods connected
-            cout = 0
-            for node in self.graph[path[i + 1]]:
-                output_edge_mod = self.edge_mods[(path[i + 1], node)]
-                if params["model_name"] == "cacti":
-                    cout+=output_edge_mod.get_input_capacitance()
-                elif params["model_name"] == "elmore":
-                    cout+=output_edge_mod.get_cin()
-                else:
-                    debug.error("Undefined model_name for analytical timing: {}".format(params["model_name"]),
-                                return_value=1)
+            cout = self.get_stage_cout(path[i + 1], params)
 
             # If at the last output, include the final output load
             if i == len(path) - 2:
                 cout += load
-                
+
+            delays.append(self.get_stage_delay(path_edge_mod, corner, cur_slew, cout, params))
             if params["model_name"] == "cacti":
-                delays.append(path_edge_mod.cacti_delay(corner, cur_slew, cout, params))
                 cur_slew = delays[-1].slew
+
+        return delays
+
+    def get_timing_table(self, path, corner, slews, loads, params):
+        """
+        Returns the total delay and output slew of the path for every
+        input slew (rows) and output load (columns) as numpy arrays.
+        The fan-out capacitances do not depend on the slew or load so they
+        are only found once. Only the last stage sees the output load so the
+        stages before it are evaluated once per slew and the last stage
+        is evaluated for all of the loads at once.
+        """
+
+        loads = np.array(loads, dtype=float)
+        delay_table = np.zeros((len(slews), len(loads)))
+        slew_table = np.zeros((len(slews), len(loads)))
+        if len(path) < 2:
+            return (delay_table, slew_table)
+
+        edge_mods = self.get_edge_mods(path)
+        couts = [self.get_stage_cout(node, params) for node in path[1:]]
+        # The final output load is added to the last stage
+        couts[-1] = couts[-1] + loads
+
+        for (row, slew) in enumerate(slews):
+            cur_slew = slew
+            total_delay = None
+            for (edge_mod, cout) in zip(edge_mods, couts):
+                stage_delay = self.get_stage_delay(edge_mod, corner, cur_slew, cout, params)
+                if params["model_name"] == "cacti":
+                    cur_slew = stage_delay.slew
+                # Same order of additions as summing the delays of get_timing
+                if total_delay is None:
+                    total_delay = stage_delay
+                else:
+                    total_delay += stage_delay
+            delay_table[row] = total_delay.delay
+            slew_table[row] = total_delay.slew
+
+        return (delay_table, slew_table)
+
+    def get_stage_cout(self, node, params):
+        """Returns the input capacitance of all of the mods driven by a node"""
+
+        cout = 0
+        for dest_node in self.graph[node]:
+            output_edge_mod = self.edge_mods[(node, dest_node)]
+            if params["model_name"] == "cacti":
+                cout+=output_edge_mod.get_input_capacitance()
             elif params["model_name"] == "elmore":
-                delays.append(path_edge_mod.analytical_delay(corner, cur_slew, cout))
+                cout+=output_edge_mod.get_cin()
             else:
                 debug.error("Undefined model_name for analytical timing: {}".format(params["model_name"]),
                             return_value=1)
+        return cout
+
+    def get_stage_delay(self, edge_mod, corner, slew, cout, params):
+        """Returns the analytical delay of the mod of an edge driving a load"""
+
+        if params["model_name"] == "cacti":
+            return edge_mod.cacti_delay(corner, slew, cout, params)
+        elif params["model_name"] == "elmore":
+            return edge_mod.analytical_delay(corner, slew, cout)
+        else:
+            debug.error("Undefined model_name for analytical timing: {}".format(params["model_name"]),
+                        return_value=1)
 
-        return delays
-        
     def get_edge_mods(self, path):
         """Return all edge mods associated with path"""
         
@@ -154,3 +248,45 @@ class timing_graph():
 
         return str(self)
 
+
+
+class timing_graph_record():
+    """
+    Records the edges that an instance of a module adds to a timing graph
+    so that the graph can be built again without walking the hierarchy.
+    The instances that are excluded from the graph are checked every time
+    the record is added to a graph.
+    """
+
+    def __init__(self, mod, inst_name, port_nets):
+        self.mod = mod
+        self.inst_name = inst_name
+        self.port_nets = port_nets
+        # The (source, destination, module) edges of a leaf module
+        self.edges = []
+        # The [instance, connections, record] of a hierarchical module
+        # The record of an instance is only made when it is first added
+        self.insts = None
+
+    def add_edge(self, src_node, dest_node, edge_mod):
+        """ Records an edge in the order that the module adds it. """
+        self.edges.append((src_node, dest_node, edge_mod))
+
+    def build_graph(self, graph):
+        """ Adds the recorded edges of the instances that are not excluded to the graph. """
+        if self.insts is None:
+            self.mod.record_graph(self)
+
+        for (src_node, dest_node, edge_mod) in self.edges:
+            graph.add_edge(src_node, dest_node, edge_mod)
+
+        for entry in self.insts:
+            (subinst, conns, record) = entry
+            if subinst in self.mod.graph_inst_exclude:
+                continue
+            if record is None:
+                subinst_name = self.inst_name + "{}x".format(OPTS.hier_seperator) + subinst.name
+                subinst_ports = self.mod.translate_nets(conns, self.port_dict, self.inst_name)
+                record = timing_graph_record(subinst.mod, subinst_name, subinst_ports)
+                entry[2] = record
+            record.build_graph(graph)
@@ -21,6 +21,20 @@ except ImportError:
 OPTS = globals.OPTS
 
 
+def write_atomic(file_name, data):
+    """
+    Writes the bytes to a temporary file that replaces the file so that
+    other processes never read a partially written file.
+    """
+    directory = os.path.dirname(file_name)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = "{0}.{1}".format(file_name, os.getpid())
+    with open(temp_file, "wb") as f:
+        f.write(data)
+    os.replace(temp_file, file_name)
+
+
 def ceil(decimal):
     """
     Performs a ceiling function on the decimal place specified by the DRC grid.
@@ -37,9 +37,33 @@ def get_data_names(file_name, exclude_area=True):
             names = names[:area_ind] + names[area_ind+1:]
     return names        
             
+# The features of each data file by its path, size and modification time
+data_cache = {}
+# The (maxs, mins, avgs) of the features of each data file
+data_stats_cache = {}
+
+def get_file_key(file_name):
+    """
+    Returns the key of a data file that changes when the file changes
+    """
+    stat = os.stat(file_name)
+    return (file_name, stat.st_size, stat.st_mtime_ns)
+
 def get_data(file_name):
     """
-    Returns data in CSV as lists of features
+    Returns data in CSV as lists of features.
+    The file is only read again when it changes.
+    """
+    
+    key = get_file_key(file_name)
+    if key not in data_cache:
+        data_cache[key] = read_data(file_name)
+    # Copy the lists so the cached data is never changed
+    return [list(feature_list) for feature_list in data_cache[key]]
+
+def read_data(file_name):
+    """
+    Reads the data in CSV as lists of features
     """
     
     with open(file_name, newline='') as csvfile:
@@ -153,17 +177,22 @@ def get_max_min_from_file(path):
         return [], [], []
     
 
-    data = get_data(path)
-    # Get max, min, sum, and count from every file
-    data_max, data_min, data_sum, count = [],[],[], 0
-    for feature_list in data:
-        data_max.append(max(feature_list))
-        data_min.append(min(feature_list))
-        data_sum.append(sum(feature_list))
-        count = len(feature_list)
+    key = get_file_key(path)
+    if key not in data_stats_cache:
+        data = get_data(path)
+        # Get max, min, sum, and count from every file
+        data_max, data_min, data_sum, count = [],[],[], 0
+        for feature_list in data:
+            data_max.append(max(feature_list))
+            data_min.append(min(feature_list))
+            data_sum.append(sum(feature_list))
+            count = len(feature_list)
+
+        avgs = [s/count for s in data_sum]
+        data_stats_cache[key] = (data_max, data_min, avgs)
 
-    avgs = [s/count for s in data_sum]
-    return data_max, data_min, avgs    
+    data_max, data_min, avgs = data_stats_cache[key]
+    return list(data_max), list(data_min), list(avgs)
     
 def get_data_and_scale(file_name, sample_dir):
     maxs,mins,avgs = get_max_min_from_datasets(sample_dir)
@@ -284,6 +313,20 @@ def scale_input_datapoint(point, file_path):
             scaled_point.append((feature-mn)/(mx-mn))
     return scaled_point
 
+def scale_datapoints(points, maxs, mins):
+    """
+    Max/min scale a matrix with a data point in each row at once.
+    Features with the same max and min are scaled to 0.
+    """
+    points = np.asarray(points, dtype=float)
+    maxs = np.asarray(maxs[:points.shape[1]], dtype=float)
+    mins = np.asarray(mins[:points.shape[1]], dtype=float)
+    ranges = maxs - mins
+    varying = ranges != 0
+    scaled_points = np.zeros(points.shape)
+    scaled_points[:, varying] = (points[:, varying] - mins[varying]) / ranges[varying]
+    return scaled_points
+
 def unscale_data(data, file_path, pos=None):
     if file_path:
         maxs,mins,avgs = get_max_min_from_file(file_path)
@@ -9,6 +9,7 @@
 from .simulation import simulation
 from globals import OPTS
 import debug
+from delay_data import delay_data
 import tech 
 
 import math
@@ -68,15 +69,16 @@ class cacti(simulation):
         port_data = self.get_empty_measure_data_dict()
         power = self.analytical_power(load_slews)
         debug.info(1, 'Slew (ns), Load (fF), Delay(ns), Slew(ns)')
+        # Calculate the delay of every load at once. The input slew is not used.
+        slew = 0
+        load_index = {load: i for i, load in enumerate(dict.fromkeys(load for load, slew in load_slews))}
+        # Calculations expect Farad, input is Femto-Farad
+        load_farads = [load*1e-15 for load in load_index]
+        (delay_table, slew_table) = self.graph.get_timing_table(bl_path, self.corner, [slew], load_farads, self.params)
         max_delay = 0.0
-        for load,slew in load_slews:
-            # Calculate delay based on slew and load
-            # Calculations expect Farad, input is Femto-Farad
-            load_farad = load*1e-15
-            #load_farad = 0.052275e-12
-            slew = 0
-            path_delays = self.graph.get_timing(bl_path, self.corner, slew, load_farad, self.params)
-            total_delay = self.sum_delays(path_delays)
+        for load,unused_slew in load_slews:
+            index = (0, load_index[load])
+            total_delay = delay_data(delay_table[index], slew_table[index])
             
             delay_ns = total_delay.delay/1e-9
             slew_ns = total_delay.slew/1e-9
@@ -16,37 +16,86 @@ def relative_compare(value1, value2, error_tolerance=0.001):
     return (abs(value1 - value2) / abs(max(value1, value2)) <= error_tolerance)
 
 
-def parse_spice_list(filename, key):
-    """Parses a hspice output.lis file for a key value"""
+# The measurements of each spice output file keyed by file name.
+# Each entry is (file stamp, measurement dict, lower case contents)
+# so that the file is only read once per simulation.
+spice_measure_cache = {}
 
-    lower_key = key.lower()
+# A "name = value" measurement in the (lower case) spice output
+spice_measure_pattern = re.compile(r"([^\s=]+)\s*=\s*(-?\d+.?\d*[e]?[-+]?[0-9]*\S*)(?=\s)")
+
+
+def clear_spice_measure_cache():
+    """ Forget the parsed measurements (i.e. when a new simulation runs) """
+    spice_measure_cache.clear()
+
+
+def get_spice_output_filename(filename):
+    """ Return the file with the measurement results for the simulator """
 
     if OPTS.spice_name == "xa" :
         # customsim has a different output file name
-        full_filename="{0}xa.meas".format(OPTS.openram_temp)
+        return "{0}xa.meas".format(OPTS.openram_temp)
     elif OPTS.spice_name == "spectre":
-        full_filename = os.path.join(OPTS.openram_temp, "delay_stim.measure")
+        return os.path.join(OPTS.openram_temp, "delay_stim.measure")
     elif OPTS.spice_name in ["Xyce", "xyce"]:
-        full_filename = os.path.join(OPTS.openram_temp, "spice_stdout.log")
+        return os.path.join(OPTS.openram_temp, "spice_stdout.log")
     else:
         # ngspice/hspice using a .lis file
-        full_filename = "{0}{1}.lis".format(OPTS.openram_temp, filename)
+        return "{0}{1}.lis".format(OPTS.openram_temp, filename)
+
+
+def parse_spice_measures(filename):
+    """
+    Parses a spice output file once into a dictionary of measurement
+    names to value strings. Returns the dictionary and the lower case
+    contents of the file.
+    """
+    full_filename = get_spice_output_filename(filename)
 
     try:
-        f = open(full_filename, "r")
-    except IOError:
+        stat = os.stat(full_filename)
+    except OSError:
         debug.error("Unable to open spice output file: {0}".format(full_filename),1)
         debug.archive()
-        
-    contents = f.read().lower()
-    f.close()
-    # val = re.search(r"{0}\s*=\s*(-?\d+.?\d*\S*)\s+.*".format(key), contents)
-    val = re.search(r"{0}\s*=\s*(-?\d+.?\d*[e]?[-+]?[0-9]*\S*)\s+.*".format(lower_key), contents)
-    if val != None:
-        debug.info(4, "Key = " + lower_key + " Val = " + val.group(1))
-        return convert_to_float(val.group(1))
+
+    # Re-read if the file was rewritten by something other than run_sim
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if full_filename in spice_measure_cache:
+        (cached_stamp, measures, contents) = spice_measure_cache[full_filename]
+        if cached_stamp == stamp:
+            return (measures, contents)
+
+    with open(full_filename, "r") as f:
+        contents = f.read().lower()
+
+    measures = {}
+    for (name, value) in spice_measure_pattern.findall(contents):
+        # Keep the first value like a search would
+        measures.setdefault(name, value)
+
+    spice_measure_cache[full_filename] = (stamp, measures, contents)
+    return (measures, contents)
+
+
+def parse_spice_list(filename, key):
+    """Parses a hspice output.lis file for a key value"""
+
+    lower_key = key.lower()
+
+    (measures, contents) = parse_spice_measures(filename)
+    if lower_key in measures:
+        value = measures[lower_key]
     else:
-        return "Failed"
+        # The key may be the end of a longer name (e.g. hierarchical) so search for it
+        # val = re.search(r"{0}\s*=\s*(-?\d+.?\d*\S*)\s+.*".format(key), contents)
+        val = re.search(r"{0}\s*=\s*(-?\d+.?\d*[e]?[-+]?[0-9]*\S*)\s+.*".format(lower_key), contents)
+        if val == None:
+            return "Failed"
+        value = val.group(1)
+
+    debug.info(4, "Key = " + lower_key + " Val = " + value)
+    return convert_to_float(value)
 
 
 def round_time(time, time_precision=3):
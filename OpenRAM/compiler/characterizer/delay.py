@@ -5,10 +5,12 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
+import os
 import shutil
 import debug
 import tech
 import math
+import multiprocessing
 from .stimuli import *
 from .trim_spice import *
 from .charutils import *
@@ -1043,6 +1045,11 @@ class delay(simulation):
         # Write ports are assumed non-critical to timing, so the first available is used
         self.targ_write_ports = [self.write_ports[0]]
         self.targ_read_ports = [port]
+
+        # Simulate several periods at once unless we are already in a worker process
+        if OPTS.num_threads > 1 and not multiprocessing.current_process().daemon:
+            return self.find_min_period_one_port_parallel(feasible_delays, port, lb_period, ub_period)
+
         while True:
             time_out -= 1
             if (time_out <= 0):
@@ -1067,6 +1074,63 @@ class delay(simulation):
             target_period = 0.5 * (ub_period + lb_period)
             # key=input("press return to continue")
 
+    def find_min_period_one_port_parallel(self, feasible_delays, port, lb_period, ub_period):
+        """
+        Searches for the min period like find_min_period_one_port, but simulates
+        OPTS.num_threads evenly spaced periods in the (lb, ub) bracket at once
+        in a pool of processes. The fastest feasible period becomes the new
+        upper bound, so ub_period is always feasible like the binary search.
+        """
+        global parallel_delay
+
+        num_candidates = OPTS.num_threads
+        time_out = 25
+        # The workers are forked so they share this delay and the feasible delays without pickling
+        parallel_delay = self
+        self.base_temp = OPTS.openram_temp
+        self.feasible_delays = feasible_delays
+        with multiprocessing.get_context("fork").Pool(num_candidates) as pool:
+            while True:
+                time_out -= 1
+                if (time_out <= 0):
+                    debug.error("Timed out, could not converge on minimum period.", 2)
+
+                step = (ub_period - lb_period) / (num_candidates + 1)
+                candidates = [lb_period + step * (i + 1) for i in range(num_candidates)]
+                debug.info(1, "MinPeriod Search Port {3}: {0}ns (ub: {1} lb: {2})".format(", ".join("{0:.4f}".format(p) for p in candidates),
+                                                                                          ub_period,
+                                                                                          lb_period,
+                                                                                          port))
+
+                results = pool.map(try_period_worker, enumerate(candidates))
+
+                # The slower infeasible candidates below the fastest feasible one raise the lower bound
+                for (period, success) in zip(candidates, results):
+                    if success:
+                        ub_period = period
+                        break
+                    lb_period = period
+
+                if relative_compare(ub_period, lb_period, error_tolerance=0.05):
+                    break
+
+        parallel_delay = None
+        self.period = ub_period
+        return ub_period
+
+    def try_period_in_temp(self, index, period):
+        """
+        Try a candidate period of the parallel search in a worker process.
+        Each candidate gets its own temp directory for the stimulus and spice output.
+        """
+        OPTS.openram_temp = "{0}period{1}/".format(self.base_temp, index)
+        os.makedirs(OPTS.openram_temp, exist_ok=True)
+        if OPTS.spice_name == "ngspice":
+            os.environ["NGSPICE_INPUT_DIR"] = "{0}".format(OPTS.openram_temp)
+
+        self.period = period
+        return self.try_period(self.feasible_delays)
+
     def try_period(self, feasible_delays):
         """
         This tries to simulate a period and checks if the result
@@ -1402,3 +1466,13 @@ class delay(simulation):
             self.stim.gen_pwl("CSB{0}".format(port), self.cycle_times, self.csb_values[port], self.period, self.slew, 0.05)
             if port in self.readwrite_ports:
                 self.stim.gen_pwl("WEB{0}".format(port), self.cycle_times, self.web_values[port], self.period, self.slew, 0.05)
+
+
+# The delay searching for the min period in the worker processes
+parallel_delay = None
+
+
+def try_period_worker(args):
+    """ Process pool entry to try a candidate period. """
+    (index, period) = args
+    return parallel_delay.try_period_in_temp(index, period)
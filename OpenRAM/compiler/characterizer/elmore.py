@@ -9,6 +9,7 @@
 from .simulation import simulation
 from globals import OPTS
 import debug
+from delay_data import delay_data
 
 class elmore(simulation):    
     """
@@ -61,13 +62,19 @@ class elmore(simulation):
         # Set delay/power for slews and loads
         port_data = self.get_empty_measure_data_dict()
         power = self.analytical_power(load_slews)
+        # Calculate the delay of every slew and load at once
+        slew_index = {slew: i for i, slew in enumerate(dict.fromkeys(slew for load, slew in load_slews))}
+        load_index = {load: i for i, load in enumerate(dict.fromkeys(load for load, slew in load_slews))}
+        (delay_table, slew_table) = self.graph.get_timing_table(bl_path,
+                                                                self.corner,
+                                                                list(slew_index),
+                                                                list(load_index),
+                                                                self.params)
         debug.info(1, 'Slew, Load, Delay(ns), Slew(ns)')
         max_delay = 0.0
         for load,slew in load_slews:
-            # Calculate delay based on slew and load
-            path_delays = self.graph.get_timing(bl_path, self.corner, slew, load, self.params)
-            
-            total_delay = self.sum_delays(path_delays)
+            index = (slew_index[slew], load_index[load])
+            total_delay = delay_data(delay_table[index], slew_table[index])
             max_delay = max(max_delay, total_delay.delay)
             debug.info(1,
                        '{}, {}, {}, {}'.format(slew,
@@ -152,23 +152,81 @@ class lib:
     def characterize_corners(self):
         """ Characterize the list of corners. """
         debug.info(1,"Characterizing corners: " + str(self.corners))
+
+        # The (slow) delay characterization of the corners can be done concurrently,
+        # but the lib and datasheet files are always written in the corner order.
+        # The models don't simulate so they are faster without the worker processes
+        # and they share the models that are trained for the first corner.
+        if OPTS.num_threads > 1 and len(self.corners) > 1 and not self.use_model:
+            corner_results = self.characterize_corners_parallel()
+        else:
+            corner_results = None
+
         is_first_corner = True
-        for (self.corner,lib_name) in zip(self.corners,self.lib_files):
+        for (index, (self.corner, lib_name)) in enumerate(zip(self.corners, self.lib_files)):
             run_start = time.time()
             debug.info(1,"Corner: " + str(self.corner))
             (self.process, self.voltage, self.temperature) = self.corner
             self.lib = open(lib_name, "w")
             debug.info(1,"Writing to {0}".format(lib_name))
             self.corner_name = lib_name.replace(self.out_dir,"").replace(".lib","")
-            self.characterize()
+            if corner_results:
+                (char_results, run_time) = corner_results[index]
+                self.set_char_results(char_results)
+                self.compute_setup_hold()
+                self.write_lib()
+            else:
+                self.characterize()
+                run_time = time.time() - run_start
             self.lib.close()
             if self.pred_time == None:
-                total_time = time.time()-run_start
+                total_time = run_time
             else:
                 total_time = self.pred_time
             self.parse_info(self.corner,lib_name, is_first_corner, total_time)
             is_first_corner = False
 
+    def characterize_corners_parallel(self):
+        """
+        Compute the delays of all corners in a pool of worker processes.
+        Each worker uses its own temp directory so that the simulations don't
+        overwrite each other. Returns the results in the corner order.
+        """
+        global parallel_lib
+        import multiprocessing
+
+        # The setup/hold times are only characterized once at the first corner
+        self.corner = self.corners[0]
+        self.compute_setup_hold()
+
+        num_workers = min(OPTS.num_threads, len(self.corners))
+        debug.info(1, "Characterizing {0} corners with {1} processes.".format(len(self.corners),
+                                                                             num_workers))
+        # The workers are forked so they share this lib and the SRAM without pickling
+        parallel_lib = self
+        self.base_temp = OPTS.openram_temp
+        with multiprocessing.get_context("fork").Pool(num_workers, maxtasksperchild=1) as pool:
+            corner_results = pool.map(characterize_corner_worker, range(len(self.corners)))
+        parallel_lib = None
+
+        return corner_results
+
+    def characterize_corner(self, index):
+        """ Compute the delays of a single corner in a worker process. """
+        run_start = time.time()
+        self.corner = self.corners[index]
+        (self.process, self.voltage, self.temperature) = self.corner
+
+        OPTS.openram_temp = "{0}corner{1}/".format(self.base_temp, index)
+        os.makedirs(OPTS.openram_temp, exist_ok=True)
+        if OPTS.spice_name == "ngspice":
+            os.environ["NGSPICE_INPUT_DIR"] = "{0}".format(OPTS.openram_temp)
+
+        debug.info(1,"Corner: {0} in {1}".format(self.corner, OPTS.openram_temp))
+        self.compute_delay()
+
+        return ((self.char_sram_results, self.char_port_results), time.time() - run_start)
+
     def characterize(self):
         """ Characterize the current corner. """
 
@@ -176,6 +234,11 @@ class lib:
 
         self.compute_setup_hold()
 
+        self.write_lib()
+
+    def write_lib(self):
+        """ Write the lib file of the current corner. """
+
         self.write_header()
 
         # Loop over all ports.
@@ -654,10 +717,7 @@ class lib:
             char_results = self.d.analyze(probe_address, probe_data, self.load_slews)
 
 
-
-        self.char_sram_results, self.char_port_results = char_results
-        if 'sim_time' in self.char_sram_results:
-            self.pred_time = self.char_sram_results['sim_time']
+        self.set_char_results(char_results)
         # Add to the OPTS to be written out as part of the extended OPTS file
         # FIXME: Temporarily removed from characterization output
         # if not self.use_model:
@@ -667,6 +727,12 @@ class lib:
             # OPTS.bl_path_names = self.char_sram_results["bl_path_names"]
 
 
+    def set_char_results(self, char_results):
+        """ Save the SRAM and port characterization results of the current corner. """
+        self.char_sram_results, self.char_port_results = char_results
+        if 'sim_time' in self.char_sram_results:
+            self.pred_time = self.char_sram_results['sim_time']
+
     def compute_setup_hold(self):
         """ Do the analysis if we haven't characterized a FF yet """
         # Do the analysis if we haven't characterized a FF yet
@@ -889,3 +955,12 @@ class lib:
             datasheet.write("{0},{1},".format('read_rise_power_{}'.format(port), read1_power))
             #FIXME: should be read_fall_power
             datasheet.write("{0},{1},".format('read_fall_power_{}'.format(port), read0_power))
+
+
+# The lib being characterized by the corner worker processes
+parallel_lib = None
+
+
+def characterize_corner_worker(index):
+    """ Process pool entry to compute the delays of a corner. """
+    return parallel_lib.characterize_corner(index)
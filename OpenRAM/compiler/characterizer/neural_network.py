@@ -10,6 +10,7 @@ from .regression_model import regression_model
 from globals import OPTS
 import debug
 from sklearn.neural_network import MLPRegressor
+import numpy as np
 
 
 class neural_network(regression_model):
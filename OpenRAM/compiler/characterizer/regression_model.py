@@ -9,9 +9,13 @@
 from .analytical_util import *
 from .simulation import simulation
 from globals import OPTS
+from utils import write_atomic
 import debug
 
 import math
+import os
+import pickle
+import hashlib
 
 relative_data_path = "sim_data"
 data_file = "sim_data.csv"
@@ -44,6 +48,9 @@ else:
     
 data_path = data_dir + '/' + data_file
 
+# The fitted models and data scaling of each data file, model and hyperparameters
+model_store = {}
+
 class regression_model(simulation):
 
     def __init__(self, sram, spfile, corner):
@@ -70,15 +77,17 @@ class regression_model(simulation):
         self.num_inputs = len(model_inputs)+2
         
         self.create_measurement_names()
-        models = self.train_models()
+        models = self.get_models()
 
         # Set delay/power for slews and loads
         port_data = self.get_empty_measure_data_dict()
         debug.info(1, 'Slew, Load, Port, Delay(ns), Slew(ns)')
         max_delay = 0.0
-        for load, slew in load_slews:
-            # List returned with value order being delay, power, leakage, slew
-            sram_vals = self.get_predictions(model_inputs+[slew, load], models)
+        # Predict every load and slew at once
+        predictions = self.get_predictions([model_inputs+[slew, load] for load, slew in load_slews], models)
+        for index, (load, slew) in enumerate(load_slews):
+            # The values of an output are in the order of the load and slews
+            sram_vals = {dname: predictions[dname][index] for dname in predictions}
             # Delay is only calculated on a single port and replicated for now.
             for port in self.all_ports:
                 port_data[port]['delay_lh'].append(sram_vals['rise_delay'])
@@ -114,24 +123,76 @@ class regression_model(simulation):
 
     def get_predictions(self, model_inputs, models): 
         """
-        Generate a model and prediction for LIB output
+        Generate the predictions of each LIB output for a list of model inputs.
+        Every output model predicts all of the inputs at once.
         """
         
         #Scaled the inputs using first data file as a reference    
-        scaled_inputs = np.asarray([scale_input_datapoint(model_inputs, data_path)])
+        scaled_inputs = scale_datapoints(model_inputs, self.data_maxs, self.data_mins)
 
         predictions = {}
         out_pos = 0
         for dname in self.output_names:
             m = models[dname]
         
-            scaled_pred = self.model_prediction(m, scaled_inputs)
-            pred = unscale_data(scaled_pred.tolist(), data_path, pos=self.num_inputs+out_pos)
+            scaled_pred = np.ravel(self.model_prediction(m, scaled_inputs))
+            pos = self.num_inputs + out_pos
+            pred = scaled_pred*(self.data_maxs[pos]-self.data_mins[pos]) + self.data_mins[pos]
             debug.info(2,"Unscaled Prediction = {}".format(pred))
-            predictions[dname] = pred[0]
+            predictions[dname] = pred.tolist()
             out_pos+=1
         return predictions
 
+    def get_models(self):
+        """
+        Return the fitted models of the outputs from the model store.
+        The models are only trained once for each data file, model and
+        hyperparameters. The store is also saved to model_store_path
+        so that later runs load the models instead of training them.
+        """
+        key = self.get_model_key()
+        if key not in model_store:
+            model_file = None
+            if OPTS.model_store_path:
+                model_file = os.path.join(OPTS.model_store_path, "{}.pkl".format(key))
+
+            if model_file and os.path.isfile(model_file):
+                debug.info(1, "Loading regression models from {}".format(model_file))
+                with open(model_file, "rb") as f:
+                    model_store[key] = pickle.load(f)
+            else:
+                models = self.train_models()
+                maxs, mins, avgs = get_max_min_from_file(data_path)
+                model_store[key] = {"output_names": self.output_names,
+                                    "models": models,
+                                    "maxs": maxs,
+                                    "mins": mins}
+                if model_file:
+                    debug.info(1, "Saving regression models to {}".format(model_file))
+                    write_atomic(model_file, pickle.dumps(model_store[key]))
+
+        self.output_names = model_store[key]["output_names"]
+        # The max/min of the data scale the inputs and outputs of the models
+        self.data_maxs = model_store[key]["maxs"]
+        self.data_mins = model_store[key]["mins"]
+        return model_store[key]["models"]
+
+    def get_model_key(self):
+        """
+        Return the hash of the data file, the model and its hyperparameters.
+        """
+        from sklearn import __version__ as sklearn_version
+
+        h = hashlib.sha256()
+        with open(data_path, "rb") as f:
+            h.update(f.read())
+        model = self.get_model()
+        h.update("{0} {1} {2} {3}".format(type(model).__name__,
+                                          sorted(model.get_params().items()),
+                                          self.num_inputs,
+                                          sklearn_version).encode())
+        return h.hexdigest()
+
     def train_models(self):
         """
         Generate and return models
@@ -571,10 +571,13 @@ class simulation():
             self.sram.graph_clear_column_mux(port)
             self.sram.graph_exclude_column_mux(self.bitline_column, port)
 
-        # Generate new graph every analysis as edges might change depending on test bit
+        # Generate new graph every analysis as edges might change depending on test bit.
+        # The hierarchy is only walked once and the recorded edges are added
+        # with the exclusions of the test bit.
         self.graph = timing_graph.timing_graph()
         self.sram_instance_name = "X{}".format(self.sram.name)
-        self.sram.build_graph(self.graph, self.sram_instance_name, self.pins)
+        graph_record = self.sram.get_graph_record(self.sram_instance_name, self.pins)
+        graph_record.build_graph(self.graph)
 
     def get_bl_name_search_exclusions(self):
         """
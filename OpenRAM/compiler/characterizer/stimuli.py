@@ -17,6 +17,7 @@ import subprocess
 import os
 import numpy as np
 from globals import OPTS
+from .charutils import clear_spice_measure_cache
 
 
 class stimuli():
@@ -402,6 +403,9 @@ class stimuli():
             # for some reason, ngspice-25 returns 1 when it only has acceptable warnings
             valid_retcode=1
 
+        # The measurements of any previous simulation are stale now
+        clear_spice_measure_cache()
+
         spice_stdout = open("{0}spice_stdout.log".format(OPTS.openram_temp), 'w')
         spice_stderr = open("{0}spice_stderr.log".format(OPTS.openram_temp), 'w')
 
@@ -10,4 +10,4 @@ from .gds2writer import *
 from .vlsiLayout import *
 from .gdsStreamer import *
 from .gdsPrimitives import *
-
+from .shapeIndex import *
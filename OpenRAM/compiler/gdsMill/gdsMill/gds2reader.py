@@ -1,20 +1,41 @@
 #!/usr/bin/env python
+import mmap
 import struct
 from .gdsPrimitives import *
 
 class Gds2reader:
     """Class to read in a file in GDSII format and populate a layout class with it"""
     ## Based on info from http://www.rulabinsky.com/cavd/text/chapc.html
-    global offset
-    offset=0
 
     def __init__(self,layoutObject,debugToTerminal = 0):
         self.fileHandle = None
+        # the (memory mapped) contents of the file and the offset of the next record
+        self.data = None
+        self.offset = 0
+        # the names of the structures to decode, None reads all of them
+        self.structNames = None
+        self.lastStructure = None
         self.layoutObject = layoutObject
         self.debugToTerminal=debugToTerminal
 
           #do we dump debug data to the screen
 
+    def openFile(self,fileName):
+        """Map the file into memory so that the records are read without any file I/O"""
+        self.fileHandle = open(fileName,"rb")
+        try:
+            self.data = mmap.mmap(self.fileHandle.fileno(),0,access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # empty files (and some special files) can't be mapped
+            self.data = self.fileHandle.read()
+        self.offset = 0
+
+    def closeFile(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = None
+        self.fileHandle.close()
+
     def print64AsBinary(self,number):
         for index in range(0,64):
             print((number>>(63-index))&0x1,eol='')
@@ -72,18 +93,74 @@ class Gds2reader:
         print("Check:"+str(newFloat))
 
     def readNextRecord(self):
-        global offset
-        recordLengthAscii = self.fileHandle.read(2) #first 2 bytes tell us the length of the record
-        if len(recordLengthAscii)==0:
+        offset = self.offset
+        data = self.data
+        if offset+2 > len(data):
             return
-        recordLength = struct.unpack(">h",recordLengthAscii)  #gives us a tuple with a short int inside
-        offset_int = int(recordLength[0])  # extract length
-        offset += offset_int  # count offset
+        recordLength = (data[offset]<<8)|data[offset+1] #first 2 bytes tell us the length of the record
+        if recordLength < 2:
+            # zero padding at the end of the file
+            self.offset = len(data)
+            return data[offset+2:]
+        self.offset = offset+recordLength  # count offset
+        record = data[offset+2:self.offset] #the rest of it (without the length)
         if(self.debugToTerminal==1):
-            print("Offset: " + str(offset))  #print out the record numbers for de-bugging
-        record = self.fileHandle.read(recordLength[0]-2) #read the rest of it (first 2 bytes were already read)
+            print("Offset: " + str(self.offset))  #print out the record numbers for de-bugging
         return record
 
+    def readCoordinates(self,record):
+        """Decode all of the XY points of a record with a single unpack"""
+        numValues = (len(record)-2)//4  #packed as XY coordinates 4 bytes each
+        values = iter(struct.unpack_from(">{0}i".format(numValues),record,2))
+        coordinates = list(zip(values,values))
+        if(self.debugToTerminal==1):
+            for (x,y) in coordinates:
+                print("\t\t\tXY Point: "+str(x)+","+str(y))
+        return coordinates
+
+    def skipStructure(self):
+        """Walk the record headers to the end of the structure without decoding them"""
+        while self.offset+4 <= len(self.data):
+            (recordLength,idBits) = struct.unpack_from(">H2s",self.data,self.offset)
+            if recordLength < 4:
+                break
+            self.offset += recordLength
+            if idBits==b'\x07\x00':
+                break
+
+    def findReferences(self):
+        """
+        Walk the record headers of the whole file and return a dictionary
+        of the structures referenced by each structure. Only the structure
+        and reference names are decoded.
+        """
+        references = {}
+        structName = None
+        offset = self.offset
+        while offset+4 <= len(self.data):
+            (recordLength,idBits) = struct.unpack_from(">H2s",self.data,offset)
+            if recordLength < 4:
+                break
+            if idBits==b'\x06\x06':  #Structure Name
+                structName = self.stripNonASCII(self.data[offset+4:offset+recordLength]).rstrip("\x00")
+                references[structName] = set()
+            elif idBits==b'\x12\x06' and structName:  #Reference Name
+                references[structName].add(self.stripNonASCII(self.data[offset+4:offset+recordLength]).rstrip().rstrip("\x00"))
+            offset += recordLength
+        return references
+
+    def setStructNames(self,structNames):
+        """Only decode the given structures and the structures they (hierarchically) reference"""
+        references = self.findReferences()
+        self.structNames = set()
+        unvisited = [x.rstrip("\x00") for x in structNames]
+        while unvisited:
+            name = unvisited.pop()
+            if name in self.structNames:
+                continue
+            self.structNames.add(name)
+            unvisited.extend(references.get(name, []))
+
     def readHeader(self):
         self.layoutObject.info.clear()
         ##  Header
@@ -149,12 +226,12 @@ class Gds2reader:
                 if(self.debugToTerminal==1):
                     print("Attributes:"+attributeTable)
             elif(idBits==b'\x22\x02'):
-                generations = struct.unpack(">h",record[2]+record[3])
+                generations = struct.unpack(">h",record[2:4])
                 self.layoutObject.info["generations"]=generations
                 if(self.debugToTerminal==1):
                     print("Generations:"+generations                )
             elif(idBits==b'\x36\x02'):
-                fileFormat = struct.unpack(">h",record[2]+record[3])
+                fileFormat = struct.unpack(">h",record[2:4])
                 self.layoutObject.info["fileFormat"]=fileFormat
                 if(self.debugToTerminal==1):
                     print("File Format:"+fileFormat)
@@ -205,14 +282,7 @@ class Gds2reader:
                 if(self.debugToTerminal==1):
                     print("\t\tPurpose Layer: "+str(purposeLayer))
             elif(idBits==b'\x10\x03'):  #XY Data Points
-                numDataPoints = len(record)-2  #packed as XY coordinates 4 bytes each
-                thisBoundary.coordinates=[]
-                for index in range(2,numDataPoints+2,8):  #incorporate the 2 byte offset
-                    x=struct.unpack(">i",record[index:index+4])[0]
-                    y=struct.unpack(">i",record[index+4:index+8])[0]
-                    thisBoundary.coordinates+=[(x,y)]
-                    if(self.debugToTerminal==1):
-                        print("\t\t\tXY Point: "+str(x)+","+str(y))
+                thisBoundary.coordinates=self.readCoordinates(record)
             elif(idBits==b'\x11\x00'):  #End Of Element
                 if(self.debugToTerminal==1):
                     print("\t\tEndBoundary")
@@ -265,14 +335,7 @@ class Gds2reader:
                 if(self.debugToTerminal==1):
                     print("\t\t\tPath Width: "+str(pathWidth))
             elif(idBits==b'\x10\x03'):  #XY Data Points
-                numDataPoints = len(record)-2  #packed nas XY coordinates 4 bytes each
-                thisPath.coordinates=[]
-                for index in range(2,numDataPoints+2,8):  #incorporate the 2 byte offset
-                    x=struct.unpack(">i",record[index:index+4])[0]
-                    y=struct.unpack(">i",record[index+4:index+8])[0]
-                    thisPath.coordinates+=[(x,y)]
-                    if(self.debugToTerminal==1):
-                        print("\t\t\tXY Point: "+str(x)+","+str(y))
+                thisPath.coordinates=self.readCoordinates(record)
             elif(idBits==b'\x11\x00'):  #End Of Element
                 if(self.debugToTerminal==1):
                     print("\t\tEndPath")
@@ -354,8 +417,8 @@ class Gds2reader:
                 if(self.debugToTerminal==1):
                     print("\t\tPLEX: "+str(plex))
             elif(idBits==b'\x12\x06'):  #Reference Name
-                aName = record[2::]
-                thisAref.aName=aName
+                aName = self.stripNonASCII(record[2::])
+                thisAref.aName=aName.rstrip()
                 if(self.debugToTerminal==1):
                     print("\t\tReference Name:"+aName)
             elif(idBits==b'\x1A\x01'):  #Transformation
@@ -378,17 +441,14 @@ class Gds2reader:
                 thisAref.rotateAngle=rotateAngle
                 if(self.debugToTerminal==1):
                     print("\t\t\tRotate Angle (CCW):"+str(rotateAngle))
+            elif(idBits==b'\x13\x02'):  #Columns and Rows
+                colRow = struct.unpack(">2h",record[2:6])
+                thisAref.colRow=colRow
+                if(self.debugToTerminal==1):
+                    print("\t\t\tColumns: "+str(colRow[0])+" Rows: "+str(colRow[1]))
             elif(idBits==b'\x10\x03'):  #XY Data Points
-                index=2
-                topLeftX=struct.unpack(">i",record[index:index+4])[0]
-                topLeftY=struct.unpack(">i",record[index+4:index+8])[0]
-                rightMostX=struct.unpack(">i",record[index+8:index+12])[0]
-                bottomMostY=struct.unpack(">i",record[index+12:index+16])[0]
-                thisAref.coordinates=[(topLeftX,topLeftY),(rightMostX,topLeftY),(topLeftX,bottomMostY)]
-                if(self.debugToTerminal==1):
-                    print("\t\t\tTop Left Point: "+str(topLeftX)+","+str(topLeftY))
-                    print("\t\t\t\tArray Width: "+str(rightMostX-topLeftX))
-                    print("\t\t\t\tArray Height: "+str(topLeftY-bottomMostY))
+                #the reference point and the points displaced by all the columns and rows
+                thisAref.coordinates=self.readCoordinates(record)
             elif(idBits==b'\x11\x00'):  #End Of Element
                 if(self.debugToTerminal==1):
                     print("\t\t\tEndAref")
@@ -531,14 +591,7 @@ class Gds2reader:
                 if(self.debugToTerminal==1):
                     print("\t\tNode Type: "+str(nodeType))
             elif(idBits==b'\x10\x03'):  #XY Data Points
-                numDataPoints = len(record)-2  #packed as XY coordinates 4 bytes each
-                thisNode.coordinates=[]
-                for index in range(2,numDataPoints+2,8):  #incorporate the 2 byte offset
-                    x=struct.unpack(">i",record[index:index+4])[0]
-                    y=struct.unpack(">i",record[index+4:index+8])[0]
-                    thisNode.coordinates+=[(x,y)]
-                    if(self.debugToTerminal==1):
-                        print("\t\t\tXY Point: "+str(x)+","+str(y))
+                thisNode.coordinates=self.readCoordinates(record)
             elif(idBits==b'\x11\x00'):  #End Of Element
                 if(self.debugToTerminal==1):
                     print("\t\t\tEndNode")
@@ -582,14 +635,7 @@ class Gds2reader:
                 if(self.debugToTerminal==1):
                     print("\t\tBox Value: "+str(boxValue))
             elif(idBits==b'\x10\x03'):  #XY Data Points that form a closed box
-                numDataPoints = len(record)-2  #packed as XY coordinates 4 bytes each
-                thisBox.coordinates=[]
-                for index in range(2,numDataPoints+2,8):  #incorporate the 2 byte offset
-                    x=struct.unpack(">i",record[index:index+4])[0]
-                    y=struct.unpack(">i",record[index+4:index+8])[0]
-                    thisBox.coordinates+=[(x,y)]
-                    if(self.debugToTerminal==1):
-                        print("\t\t\tXY Point: "+str(x)+","+str(y))
+                thisBox.coordinates=self.readCoordinates(record)
             elif(idBits==b'\x11\x00'):  #End Of Element
                 if(self.debugToTerminal==1):
                     print("\t\t\tEndBox")
@@ -633,6 +679,12 @@ class Gds2reader:
                 thisStructure.name = structName
                 if(self.debugToTerminal==1):
                     print("\tStructure Name: "+structName)
+                if self.structNames is not None and structName.rstrip("\x00") not in self.structNames:
+                    if(self.debugToTerminal==1):
+                        print("\tSkipping Structure.")
+                    self.skipStructure()
+                    self.lastStructure = None
+                    return 1
             elif(idBits==b'\x08\x00'):
                 thisStructure.boundaries+=[self.readBoundary()]
             elif(idBits==b'\x09\x00'):
@@ -650,6 +702,7 @@ class Gds2reader:
         if(self.debugToTerminal==1):
             print("\tEnd of Structure.")
         self.layoutObject.structures[structName]=thisStructure #add this structure to the layout object
+        self.lastStructure = thisStructure
         return 1
 
     def readGds2(self):
@@ -669,168 +722,60 @@ class Gds2reader:
         else:
             print("There was an error parsing the GDS header.  Aborting...")
 
-    def loadFromFile(self, fileName, special_purposes={}):
-        self.fileHandle = open(fileName,"rb")
+    def loadFromFile(self, fileName, special_purposes={}, structNames=None):
+        """
+        Read the GDS file into the layout object. If a list of structure
+        names is given, only those structures and the structures they
+        reference are decoded.
+        """
+        self.openFile(fileName)
+        if structNames is not None:
+            self.setStructNames(structNames)
         self.readGds2()
-        self.fileHandle.close()
+        self.closeFile()
+        self.structNames = None
         self.layoutObject.initialize(special_purposes)
 
 ##############################################
 
     def findStruct(self,fileName,findStructName):
-	#print("find struct")
-        self.fileHandle = open(fileName,"rb")
+        """Read until the given structure and return its boundaries"""
+        self.openFile(fileName)
         self.debugToTerminal=0
+        # Only the wanted structure is decoded
+        self.structNames = set([findStructName.rstrip("\x00")])
+        record = None
         if(self.readHeader()):  #did the header read ok?
-            record = self.findStruct_readNextStruct(findStructName)
+            record = self.readNextStructure()
             while(record == 1):
-                record = self.findStruct_readNextStruct(findStructName)
+                if self.lastStructure and self.lastStructure.name==findStructName:
+                    record = [0,self.lastStructure.boundaries]
+                    break
+                record = self.readNextStructure()
             #now we have fallen out of the while, which means we are out of structures
-            #so test for end of library
         else:
             print("There was an error parsing the GDS header.  Aborting...")
-        self.fileHandle.close()
-	#print("End the search of",findStructName)
-        #self.layoutObject.initialize()
+        self.closeFile()
+        self.structNames = None
         return record
 
-    def findStruct_readNextStruct(self,findStructName):
-        self.debugToTerminal=0
-        thisStructure = GdsStructure()
-        record = self.readNextRecord()
-        idBits = record[0:2]
-        if(idBits==('\x05','\x02') and len(record)==26):
-            createYear = struct.unpack(">h",record[2]+record[3])[0]
-            createMonth = struct.unpack(">h",record[4]+record[5])[0]
-            createDay = struct.unpack(">h",record[6]+record[7])[0]
-            createHour = struct.unpack(">h",record[8]+record[9])[0]
-            createMinute = struct.unpack(">h",record[10]+record[11])[0]
-            createSecond = struct.unpack(">h",record[12]+record[13])[0]
-            modYear = struct.unpack(">h",record[14]+record[15])[0]
-            modMonth = struct.unpack(">h",record[16]+record[17])[0]
-            modDay = struct.unpack(">h",record[18]+record[19])[0]
-            modHour = struct.unpack(">h",record[20]+record[21])[0]
-            modMinute = struct.unpack(">h",record[22]+record[23])[0]
-            modSecond = struct.unpack(">h",record[24]+record[25])[0]
-            thisStructure.createDate=(createYear,createMonth,createDay,createHour,createMinute,createSecond)
-            thisStructure.modDate=(modYear,modMonth,modDay,modHour,modMinute,modSecond)
-        else:
-            #means we have hit the last structure, so return the record
-            #to whoever called us to do something with it
-            return record
-        wantedStruct=0
-        while 1:
-            record = self.readNextRecord()
-            idBits = record[0:2]
-            if idBits==('\x07','\x00'): break; #we've reached the end of the structure
-            elif(idBits==('\x06','\x06')):
-                structName = self.stripNonASCII(record[2::]) #(record[2:1] + record[1::]).rstrip()
-                thisStructure.name = structName
-                if(findStructName==thisStructure.name):
-                    wantedStruct=1
-                if(self.debugToTerminal==1):
-                    print("\tStructure Name: "+structName)
-            elif(idBits==('\x08','\x00')):
-                thisStructure.boundaries+=[self.readBoundary()]
-            elif(idBits==('\x09','\x00')):
-                thisStructure.paths+=[self.readPath()]
-            elif(idBits==('\x0A','\x00')):
-                thisStructure.srefs+=[self.readSref()]
-            elif(idBits==('\x0B','\x00')):
-                thisStructure.arefs+=[self.readAref()]
-            elif(idBits==('\x0C','\x00')):
-                thisStructure.texts+=[self.readText()]
-            elif(idBits==('\x15','\x00')):
-                thisStructure.nodes+=[self.readNode()]
-            elif(idBits==('\x2E','\x02')):
-                thisStructure.boxes+=[self.readBox()]
-        if(self.debugToTerminal==1):
-            print("\tEnd of Structure.")
-        self.layoutObject.structures[structName]=thisStructure #add this structure to the layout object
-        if(wantedStruct == 0):
-            return 1
-        else:
-	    #print("\tDone with collectting bound. Return")
-            return [0,thisStructure.boundaries]
-
     def findLabel(self,fileName,findLabelName):
-	#print("find Label")
-        self.fileHandle = open(fileName,"rb")
+        """Read until a structure with the given label and return the matching labels"""
+        self.openFile(fileName)
         self.debugToTerminal=0
+        record = None
         if(self.readHeader()):  #did the header read ok?
-            record = self.findLabel_readNextStruct(findLabelName)
+            record = self.readNextStructure()
             while(record == 1):
-                record = self.findLabel_readNextStruct(findLabelName)
+                #Be careful: label.textString contains one space string in it. Delete that one before use it
+                wantedtexts = [label for label in self.lastStructure.texts
+                               if findLabelName == label.textString[0:(len(label.textString)-1)]]
+                if wantedtexts:
+                    record = [0,[GdsText()]+wantedtexts]
+                    break
+                record = self.readNextStructure()
             #now we have fallen out of the while, which means we are out of structures
-            #so test for end of library
         else:
             print("There was an error parsing the GDS header.  Aborting...")
-        self.fileHandle.close()
-	#print("End the search of",findStructName)
-        #self.layoutObject.initialize()
+        self.closeFile()
         return record
-
-    def findLabel_readNextStruct(self,findLabelName):
-        self.debugToTerminal=0
-        thisStructure = GdsStructure()
-        record = self.readNextRecord()
-        idBits = record[0:2]
-        if(idBits==('\x05','\x02') and len(record)==26):
-            createYear = struct.unpack(">h",record[2]+record[3])[0]
-            createMonth = struct.unpack(">h",record[4]+record[5])[0]
-            createDay = struct.unpack(">h",record[6]+record[7])[0]
-            createHour = struct.unpack(">h",record[8]+record[9])[0]
-            createMinute = struct.unpack(">h",record[10]+record[11])[0]
-            createSecond = struct.unpack(">h",record[12]+record[13])[0]
-            modYear = struct.unpack(">h",record[14]+record[15])[0]
-            modMonth = struct.unpack(">h",record[16]+record[17])[0]
-            modDay = struct.unpack(">h",record[18]+record[19])[0]
-            modHour = struct.unpack(">h",record[20]+record[21])[0]
-            modMinute = struct.unpack(">h",record[22]+record[23])[0]
-            modSecond = struct.unpack(">h",record[24]+record[25])[0]
-            thisStructure.createDate=(createYear,createMonth,createDay,createHour,createMinute,createSecond)
-            thisStructure.modDate=(modYear,modMonth,modDay,modHour,modMinute,modSecond)
-        else:
-            #means we have hit the last structure, so return the record
-            #to whoever called us to do something with it
-            return record
-        wantedLabel=0
-        wantedtexts=[GdsText()]
-        while 1:
-            record = self.readNextRecord()
-            idBits = record[0:2]
-            if idBits==('\x07','\x00'): break; #we've reached the end of the structure
-            elif(idBits==('\x06','\x06')):
-                structName = self.stripNonASCII(record[2::]) #(record[2:1] + record[1::]).rstrip()
-                thisStructure.name = structName
-                if(self.debugToTerminal==1):
-                    print("\tStructure Name: "+structName)
-            elif(idBits==('\x08','\x00')):
-                thisStructure.boundaries+=[self.readBoundary()]
-            elif(idBits==('\x09','\x00')):
-                thisStructure.paths+=[self.readPath()]
-            elif(idBits==('\x0A','\x00')):
-                thisStructure.srefs+=[self.readSref()]
-            elif(idBits==('\x0B','\x00')):
-                thisStructure.arefs+=[self.readAref()]
-            elif(idBits==('\x0C','\x00')):
-                label=self.readText()
-		#Be careful: label.textString contains one space string in it. Delete that one before use it
-                if( findLabelName == label.textString[0:(len(label.textString)-1)] ):
-                    wantedLabel=1
-                    wantedtexts+=[label]
-                thisStructure.texts+=[label]
-                if(self.debugToTerminal == 1):
-                    print(label.textString[0:(len(label.textString)-1)],findLabelName,( findLabelName == label.textString[0:(len(label.textString)-1)] ))
-            elif(idBits==('\x15','\x00')):
-                thisStructure.nodes+=[self.readNode()]
-            elif(idBits==('\x2E','\x02')):
-                thisStructure.boxes+=[self.readBox()]
-        if(self.debugToTerminal==1):
-            print("\tEnd of Structure.")
-        self.layoutObject.structures[structName]=thisStructure #add this structure to the layout object
-        if(wantedLabel == 0):
-            return 1
-        else:
-            #print("\tDone with collectting bound. Return")
-            return [0,wantedtexts]
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import struct
+from itertools import chain
 from .gdsPrimitives import *
 
 class Gds2writer:
@@ -10,6 +11,9 @@ class Gds2writer:
         self.fileHandle = 0
         self.layoutObject = layoutObject
         self.debugToTerminal=0  #do we dump debug data to the screen
+        #the records are collected in a buffer and written to the file in large chunks
+        self.buffer = bytearray()
+        self.bufferSize = 1<<20
 
     def print64AsBinary(self,number):
         #debugging method for binary inspection
@@ -93,8 +97,21 @@ class Gds2writer:
 
     def writeRecord(self,record):
         recordLength = len(record)+2  #make sure to include this in the length
-        recordLengthAscii=struct.pack(">h",recordLength)
-        self.fileHandle.write(recordLengthAscii+record)
+        buffer = self.buffer
+        buffer += recordLength.to_bytes(2,"big")
+        buffer += record
+        if len(buffer) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records to the file"""
+        self.fileHandle.write(self.buffer)
+        self.buffer = bytearray()
+
+    def packCoordinates(self,coordinates):
+        """Pack a list of XY points into the data of an XY record with a single pack"""
+        values = list(map(int,chain.from_iterable(coordinates)))
+        return struct.pack(">{0}i".format(len(values)),*values)
 
     def writeHeader(self):
         ##  Header
@@ -206,13 +223,7 @@ class Gds2writer:
             self.writeRecord(idBits+dataType)
         if(thisBoundary.coordinates!=""):
             idBits=b'\x10\x03' # XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisBoundary.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisBoundary.coordinates))
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
@@ -250,13 +261,7 @@ class Gds2writer:
             self.writeRecord(idBits+pathWidth)
         if(thisPath.coordinates):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisPath.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisPath.coordinates))
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
@@ -301,14 +306,8 @@ class Gds2writer:
             self.writeRecord(idBits+rotateAngle)
         if(thisSref.coordinates!=""):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
             coordinate = thisSref.coordinates
-            x=struct.pack(">i",int(coordinate[0]))
-            y=struct.pack(">i",int(coordinate[1]))
-            coordinateRecord+=x
-            coordinateRecord+=y
-	    #print(thisSref.coordinates)
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+struct.pack(">2i",int(coordinate[0]),int(coordinate[1])))
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
@@ -330,7 +329,7 @@ class Gds2writer:
                 aName = thisAref.aName+"\0"
             else:
                 aName = thisAref.aName
-            self.writeRecord(idBits+aName)
+            self.writeRecord(idBits+aName.encode())
         if(thisAref.transFlags):
             idBits=b'\x1A\x01'
             mirrorFlag = int(thisAref.transFlags[0])<<15
@@ -351,15 +350,12 @@ class Gds2writer:
             idBits=b'\x1C\x05'
             rotateAngle=self.ibmDataFromIeeeDouble(thisAref.rotateAngle)
             self.writeRecord(idBits+rotateAngle)
+        if(thisAref.colRow):
+            idBits=b'\x13\x02'  #Columns and Rows
+            self.writeRecord(idBits+struct.pack(">2h",*thisAref.colRow))
         if(thisAref.coordinates):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisAref.coordinates:
-                x=struct.pack(">i",coordinate[0])
-                y=struct.pack(">i",coordinate[1])
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisAref.coordinates))
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
@@ -419,13 +415,7 @@ class Gds2writer:
             self.writeRecord(idBits+transFlags)
         if(thisText.coordinates!=""):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisText.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisText.coordinates))
         if(thisText.textString):
             idBits=b'\x19\x06'
             textString = thisText.textString
@@ -454,15 +444,9 @@ class Gds2writer:
             idBits=b'\x2A\x02'
             nodeType = struct.pack(">h",thisNode.nodeType)
             self.writeRecord(idBits+nodeType)
-        if(thisText.coordinates!=""):
+        if(thisNode.coordinates!=""):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisText.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisNode.coordinates))
 
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
@@ -493,13 +477,7 @@ class Gds2writer:
             self.writeRecord(idBits+boxValue)
         if(thisBox.coordinates!=""):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisBox.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisBox.coordinates))
 
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
@@ -509,20 +487,9 @@ class Gds2writer:
         #first put in the structure head
         thisStructure = self.layoutObject.structures[structureName]
         idBits=b'\x05\x02'
-        createYear = struct.pack(">h",thisStructure.createDate[0])
-        createMonth = struct.pack(">h",thisStructure.createDate[1])
-        createDay = struct.pack(">h",thisStructure.createDate[2])
-        createHour = struct.pack(">h",thisStructure.createDate[3])
-        createMinute = struct.pack(">h",thisStructure.createDate[4])
-        createSecond = struct.pack(">h",thisStructure.createDate[5])
-        modYear = struct.pack(">h",thisStructure.modDate[0])
-        modMonth = struct.pack(">h",thisStructure.modDate[1])
-        modDay = struct.pack(">h",thisStructure.modDate[2])
-        modHour = struct.pack(">h",thisStructure.modDate[3])
-        modMinute = struct.pack(">h",thisStructure.modDate[4])
-        modSecond = struct.pack(">h",thisStructure.modDate[5])
-        self.writeRecord(idBits+createYear+createMonth+createDay+createHour+createMinute+createSecond\
-                         +modYear+modMonth+modDay+modHour+modMinute+modSecond)
+        #creation and modification year, month, day, hour, minute and second
+        dates = tuple(thisStructure.createDate[0:6])+tuple(thisStructure.modDate[0:6])
+        self.writeRecord(idBits+struct.pack(">12h",*dates))
         #now the structure name
         idBits=b'\x06\x06'
         ##caveat: the name needs to be an EVEN number of characters
@@ -562,4 +529,5 @@ class Gds2writer:
     def writeToFile(self,fileName):
         self.fileHandle = open(fileName,"wb")
         self.writeGds2()
+        self.flush()
         self.fileHandle.close()
@@ -136,6 +136,7 @@ class GdsAref:
         self.transFlags=[0,0,0]
         self.magFactor=""
         self.rotateAngle=""
+        self.colRow=""
         self.coordinates=""
 
         
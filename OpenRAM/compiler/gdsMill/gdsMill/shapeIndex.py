@@ -0,0 +1,106 @@
+import math
+import numpy as np
+
+
+class ShapeIndex:
+    """
+    A uniform bin spatial index of flattened shapes for window and point queries.
+    Shapes are [llx, lly, urx, ury] rectangles or [x1, y1, x2, y2, ...] polygons
+    and are binned by their bounding boxes. Each shape can have an item
+    (e.g. a pin) that is returned by the queries instead of the shape.
+    """
+
+    def __init__(self, shapes, items=None):
+        self.shapes = shapes
+        if items is None:
+            self.items = shapes
+        else:
+            self.items = items
+        # The bins are built on the first query
+        self.bins = None
+
+    def buildBins(self):
+        """
+        Put the bounding box of every shape in the bins that it overlaps.
+        """
+        self.bins = {}
+        if not self.shapes:
+            return
+        if all(len(shape) == 4 for shape in self.shapes):
+            rectangles = np.array(self.shapes, dtype=float)
+            bboxes = np.column_stack((np.minimum(rectangles[:, 0], rectangles[:, 2]),
+                                      np.minimum(rectangles[:, 1], rectangles[:, 3]),
+                                      np.maximum(rectangles[:, 0], rectangles[:, 2]),
+                                      np.maximum(rectangles[:, 1], rectangles[:, 3])))
+        else:
+            bboxes = np.array([boundingBox(shape) for shape in self.shapes], dtype=float)
+        self.bboxes = bboxes.tolist()
+
+        # Use about one bin per shape over the extent of all the shapes
+        self.left = bboxes[:, 0].min()
+        self.bottom = bboxes[:, 1].min()
+        right = bboxes[:, 2].max()
+        top = bboxes[:, 3].max()
+        self.numBins = max(1, int(math.sqrt(len(bboxes))))
+        self.binWidth = max(right - self.left, 1e-9) / self.numBins
+        self.binHeight = max(top - self.bottom, 1e-9) / self.numBins
+
+        columns = np.clip((bboxes[:, 0::2] - self.left) // self.binWidth, 0, self.numBins - 1).astype(int)
+        rows = np.clip((bboxes[:, 1::2] - self.bottom) // self.binHeight, 0, self.numBins - 1).astype(int)
+        for (index, (left, right), (bottom, top)) in zip(range(len(bboxes)), columns.tolist(), rows.tolist()):
+            for i in range(left, right + 1):
+                for j in range(bottom, top + 1):
+                    self.bins.setdefault((i, j), []).append(index)
+
+    def binKeys(self, bbox):
+        """
+        Return the keys of the bins that a bounding box overlaps.
+        """
+        (left, bottom) = self.binOf(bbox[0], bbox[1])
+        (right, top) = self.binOf(bbox[2], bbox[3])
+        return [(i, j) for i in range(left, right + 1) for j in range(bottom, top + 1)]
+
+    def binOf(self, x, y):
+        """
+        Return the bin of a coordinate clipped to the bins.
+        """
+        i = min(max(int((x - self.left) // self.binWidth), 0), self.numBins - 1)
+        j = min(max(int((y - self.bottom) // self.binHeight), 0), self.numBins - 1)
+        return (i, j)
+
+    def queryWindow(self, ll, ur):
+        """
+        Return the items with a bounding box that overlaps the window from
+        ll to ur (touching counts) in their original order.
+        """
+        if self.bins is None:
+            self.buildBins()
+        if not self.bins:
+            return []
+
+        found = set()
+        for key in self.binKeys((ll[0], ll[1], ur[0], ur[1])):
+            for index in self.bins.get(key, []):
+                bbox = self.bboxes[index]
+                if bbox[0] <= ur[0] and bbox[2] >= ll[0] and bbox[1] <= ur[1] and bbox[3] >= ll[1]:
+                    found.add(index)
+        return [self.items[index] for index in sorted(found)]
+
+    def queryPoint(self, point):
+        """
+        Return the items with a bounding box that contains the point
+        (including the edges) in their original order.
+        """
+        return self.queryWindow(point, point)
+
+
+def boundingBox(shape):
+    """
+    Return the [llx, lly, urx, ury] bounding box of a rectangle or polygon.
+    """
+    if len(shape) == 4:
+        return (min(shape[0], shape[2]), min(shape[1], shape[3]),
+                max(shape[0], shape[2]), max(shape[1], shape[3]))
+    xs = shape[0::2]
+    ys = shape[1::2]
+    return (min(xs), min(ys), max(xs), max(ys))
@@ -1,9 +1,15 @@
 from .gdsPrimitives import *
+from .shapeIndex import ShapeIndex
 from datetime import *
 import numpy as np
 import math
+import copy
 import debug
 
+# The version of the pickled layouts that is increased whenever the attributes
+# of the layout, structures or primitives change
+PICKLE_VERSION = 1
+
 
 class VlsiLayout:
     """Class represent a hierarchical layout"""
@@ -55,8 +61,13 @@ class VlsiLayout:
         # This will contain a list of all structure names
         # expanded to include srefs / arefs separately.
         # each structure will have an X,Y,offset, and rotate associated
-        # with it.  Populate via traverseTheHierarchy method.
+        # with it.  Populate via populateCoordinateMap method.
         self.xyTree = []
+        # The (structure name, placement index) of each xyTree entry
+        self.xyTreeIndices = []
+        # This is a dict indexed by the structure name with the
+        # (origin, u, v) arrays of all of its placements.
+        self.xyArrays = {}
 
         # temp variables used in delegate functions
         self.tempCoordinates=None
@@ -67,6 +78,39 @@ class VlsiLayout:
         # Multiple labels may be disconnected.
         self.pins = {}
 
+        # This is a dict indexed by the lpp with a spatial index of the
+        # flattened shapes on the layer. They are built on the first query
+        # and cleared when the layout changes.
+        self.shapeIndices = {}
+
+    def copy(self):
+        """
+        Return a copy of the layout that can be changed without changing this one.
+        The structures and their lists of primitives are copied but the primitives
+        are shared since they are replaced rather than changed.
+        """
+        newLayout = copy.copy(self)
+        newLayout.structures = dict()
+        for name, structure in self.structures.items():
+            newStructure = copy.copy(structure)
+            newStructure.boundaries = list(structure.boundaries)
+            newStructure.paths = list(structure.paths)
+            newStructure.srefs = list(structure.srefs)
+            newStructure.arefs = list(structure.arefs)
+            newStructure.texts = list(structure.texts)
+            newStructure.nodes = list(structure.nodes)
+            newStructure.boxes = list(structure.boxes)
+            newLayout.structures[name] = newStructure
+        newLayout.layerNumbersInUse = list(self.layerNumbersInUse)
+        newLayout.info = dict(self.info)
+        newLayout.xyTree = list(self.xyTree)
+        newLayout.xyTreeIndices = list(self.xyTreeIndices)
+        newLayout.xyArrays = dict(self.xyArrays)
+        newLayout.pins = {label: [list(shapes) for shapes in pinShapes]
+                          for label, pinShapes in self.pins.items()}
+        newLayout.shapeIndices = dict(self.shapeIndices)
+        return newLayout
+
     def rotatedCoordinates(self,coordinatesToRotate,rotateAngle):
         # helper method to rotate a list of coordinates
         angle=math.radians(float(0))
@@ -185,6 +229,9 @@ class VlsiLayout:
                 for sref in self.structures[name].srefs: #go through each reference
                     if sref.sName in structureNames: #and compare to our list
                         structureNames.remove(sref.sName)
+            for aref in self.structures[name].arefs: #and each array of references
+                if aref.aName in structureNames:
+                    structureNames.remove(aref.aName)
 
         debug.check(len(structureNames)==1,"Multiple possible root structures in the layout: {}".format(str(structureNames)))
         self.rootStructureName = structureNames[0]
@@ -260,29 +307,105 @@ class VlsiLayout:
                 self.processLabelPins((layerNumber, None))
 
     def populateCoordinateMap(self):
-        def addToXyTree(startingStructureName = None,transformPath = None):
-            uVector = np.array([[1.0],[0.0],[0.0]]) #start with normal basis vectors
-            vVector = np.array([[0.0],[1.0],[0.0]])
-            origin = np.array([[0.0],[0.0],[1.0]]) #and an origin (Z component is 1.0 to indicate position instead of vector)
-            #make a copy of all the transforms and reverse it
-            reverseTransformPath = transformPath[:]
-            if len(reverseTransformPath) > 1:
-                reverseTransformPath.reverse()
-            #now go through each transform and apply them to our basis and origin in succession
-            for transform in reverseTransformPath:
-                origin = np.dot(transform[0], origin)  #rotate
-                uVector = np.dot(transform[0], uVector)  #rotate
-                vVector = np.dot(transform[0], vVector)  #rotate
-                origin = np.dot(transform[1], origin)  #scale
-                uVector = np.dot(transform[1], uVector)  #scale
-                vVector = np.dot(transform[1], vVector)  #scale
-                origin = np.dot(transform[2], origin)  #translate
-                #we don't need to do a translation on the basis vectors
-                #uVector = transform[2] * uVector  #translate
-                #vVector = transform[2] * vVector  #translate
-            #populate the xyTree with each structureName and coordinate space
-            self.xyTree.append((startingStructureName,origin,uVector,vVector))
-        self.traverseTheHierarchy(delegateFunction = addToXyTree)
+        """
+        Flatten the hierarchy into the placements of every structure.
+        The transform of each reference is composed with the transform of
+        its parent as the hierarchy is descended and the elements of an AREF
+        are placed together in one batch. The origin, u and v vectors of the
+        placements of each structure are kept as arrays in xyArrays and the
+        xyTree lists them in depth first order.
+        """
+        self.shapeIndices = {}
+        del self.xyTree[:]
+        self.xyTreeIndices = []
+        placements = {}
+        counts = {}
+        # Most references share a few rotations and mirrors
+        localMatrices = {}
+
+        def localMatrix(reference):
+            key = (reference.rotateAngle, bool(reference.transFlags[0]))
+            try:
+                return localMatrices[key]
+            except KeyError:
+                local = self.referenceMatrix(reference.rotateAngle, reference.transFlags)
+                localMatrices[key] = local
+                return local
+
+        def addToXyTree(structureName, matrices, origins):
+            # The matrices have the u and v vectors as columns
+            placements.setdefault(structureName, []).append((matrices, origins))
+            start = counts.get(structureName, 0)
+            counts[structureName] = start + len(origins)
+            self.xyTreeIndices.extend((structureName, index) for index in range(start, start + len(origins)))
+            try:
+                structure = self.structures[structureName]
+            except KeyError:
+                debug.error("Could not find structure {} in GDS file.".format(structureName), -1)
+
+            for sref in structure.srefs:
+                local = localMatrix(sref)
+                offset = np.array(sref.coordinates, dtype=float)
+                addToXyTree(sref.sName, matrices @ local, origins + matrices @ offset)
+            for aref in structure.arefs:
+                local = localMatrix(aref)
+                offsets = self.arrayOffsets(aref)
+                # Every element of the array in every placement of the parent
+                arrayMatrices = np.repeat(matrices @ local, len(offsets), axis=0)
+                arrayOrigins = origins[:, np.newaxis, :] + np.einsum("nij,mj->nmi", matrices, offsets)
+                addToXyTree(aref.aName, arrayMatrices, arrayOrigins.reshape(-1, 2))
+
+        addToXyTree(self.rootStructureName, np.eye(2)[np.newaxis], np.zeros((1, 2)))
+
+        # Store column vectors like the old xyTree entries so that the
+        # xyTree can hold views of the arrays.
+        self.xyArrays = {}
+        for (structureName, structurePlacements) in placements.items():
+            matrices = np.concatenate([block[0] for block in structurePlacements])
+            origins = np.concatenate([block[1] for block in structurePlacements])
+            originVectors = np.ones((len(origins), 3, 1))
+            originVectors[:, 0:2, 0] = origins
+            uVectors = np.zeros((len(origins), 3, 1))
+            uVectors[:, 0:2, 0] = matrices[:, :, 0]
+            vVectors = np.zeros((len(origins), 3, 1))
+            vVectors[:, 0:2, 0] = matrices[:, :, 1]
+            self.xyArrays[structureName] = (originVectors, uVectors, vVectors)
+
+        for (structureName, index) in self.xyTreeIndices:
+            (originVectors, uVectors, vVectors) = self.xyArrays[structureName]
+            self.xyTree.append((structureName, originVectors[index], uVectors[index], vVectors[index]))
+
+    def referenceMatrix(self, rotateAngle, transFlags):
+        """
+        Return the 2x2 rotate and mirror X matrix of a reference. The
+        rotation is done first like in traverseTheHierarchy.
+        """
+        if(rotateAngle == None or rotateAngle == ""):
+            angle = 0
+        else:
+            angle = math.radians(float(rotateAngle))
+        mRotate = np.array([[math.cos(angle), -math.sin(angle)],
+                            [math.sin(angle), math.cos(angle)]])
+        if (transFlags[0]):
+            scaleY = -1.0
+        else:
+            scaleY = 1.0
+        mScale = np.array([[1.0, 0.0],
+                           [0.0, scaleY]])
+        return mScale @ mRotate
+
+    def arrayOffsets(self, aref):
+        """
+        Return the (columns * rows, 2) offsets of the elements of an AREF.
+        The coordinates are the reference point and the points displaced by
+        all of the columns and all of the rows.
+        """
+        (columns, rows) = aref.colRow
+        (origin, columnPoint, rowPoint) = np.array(aref.coordinates[0:3], dtype=float)
+        columnPitch = (columnPoint - origin) / columns
+        rowPitch = (rowPoint - origin) / rows
+        (rowIndex, columnIndex) = np.divmod(np.arange(columns * rows), columns)
+        return origin + np.outer(columnIndex, columnPitch) + np.outer(rowIndex, rowPitch)
 
     def microns(self, userUnits):
         """Utility function to convert user units to microns"""
@@ -394,6 +517,7 @@ class VlsiLayout:
 
         #add the sref to the root structure
         self.structures[self.rootStructureName].srefs.append(layoutToAddSref)
+        self.shapeIndices = {}
 
     def addBox(self,layerNumber=0, purposeNumber=0, offsetInMicrons=(0,0), width=1.0, height=1.0,center=False):
         """
@@ -424,6 +548,7 @@ class VlsiLayout:
         boundaryToAdd.purposeLayer = purposeNumber
         #add the sref to the root structure
         self.structures[self.rootStructureName].boundaries.append(boundaryToAdd)
+        self.shapeIndices = {}
 
     def addPath(self, layerNumber=0, purposeNumber=0, coordinates=[(0,0)], width=1.0):
         """
@@ -762,7 +887,7 @@ class VlsiLayout:
 
         # Get all of the shapes on the layer at all levels
         # and transform them to the current level
-        shapes = self.getAllShapes(lpp)
+        shapeIndex = self.getShapeIndex(lpp)
 
         for label in labels:
             label_coordinate = label.coordinates[0]
@@ -776,9 +901,9 @@ class VlsiLayout:
             try:
                 from tech import layer_override
                 if layer_override[label_text]:
-                    shapes = self.getAllShapes((layer_override[label_text][0], None))
-                    if not shapes:
-                        shapes = self.getAllShapes(lpp)
+                    shapeIndex = self.getShapeIndex((layer_override[label_text][0], None))
+                    if not shapeIndex.shapes:
+                        shapeIndex = self.getShapeIndex(lpp)
                     else:
                         lpp = layer_override[label_text]
 
@@ -786,7 +911,8 @@ class VlsiLayout:
 
             except:
                 pass
-            for boundary in shapes:
+            # Only the shapes with a bounding box around the label can enclose it
+            for boundary in shapeIndex.queryPoint(user_coordinate):
                 if self.labelInRectangle(user_coordinate, boundary):
                     pin_shapes.append((lpp, boundary))
 
@@ -820,75 +946,111 @@ class VlsiLayout:
         and [coordinate 1, coordinate 2,...] format and user
         units for polygons.
         """
+        return list(self.getShapeIndex(lpp).shapes)
+
+    def getShapesInWindow(self, lpp, ll, ur):
+        """
+        Return the shapes on a given layer (in the getAllShapes format)
+        with a bounding box that overlaps the window from ll to ur in user units.
+        """
+        return self.getShapeIndex(lpp).queryWindow(ll, ur)
+
+    def getShapesAtPoint(self, lpp, point):
+        """
+        Return the shapes on a given layer (in the getAllShapes format)
+        with a bounding box that contains the point in user units.
+        """
+        return self.getShapeIndex(lpp).queryPoint(point)
+
+    def getShapeIndex(self, lpp):
+        """
+        Return the spatial index of all the shapes on a given layer
+        at all levels of the hierarchy.
+        """
+        # The purpose can be a list of purposes
+        if isinstance(lpp[1], list):
+            key = (lpp[0], tuple(lpp[1]))
+        else:
+            key = (lpp[0], lpp[1])
+        try:
+            return self.shapeIndices[key]
+        except KeyError:
+            shapeIndex = ShapeIndex(self.flattenShapes(lpp))
+            self.shapeIndices[key] = shapeIndex
+            return shapeIndex
+
+    def flattenShapes(self, lpp):
+        """
+        Transform the shapes on a given layer in every structure in the
+        xyTree to the top level and convert them to user units.
+        """
         boundaries = set()
-        for TreeUnit in self.xyTree:
-            # print(TreeUnit[0])
-            boundaries.update(self.getShapesInStructure(lpp, TreeUnit))
+        structureShapes = {}
+        for (structureName, index) in self.xyTreeIndices:
+            try:
+                shapes = structureShapes[structureName]
+            except KeyError:
+                shapes = self.getShapesInStructure(lpp, structureName)
+                structureShapes[structureName] = shapes
+            boundaries.update(shapes[index])
 
         # Convert to user units
-        user_boundaries = []
-        for boundary in boundaries:
-            boundaries_list = []
-            for i in range(0, len(boundary)):
-                boundaries_list.append(boundary[i]*self.units[0])
-            user_boundaries.append(boundaries_list)
-        return user_boundaries
+        return [[x * self.units[0] for x in boundary] for boundary in boundaries]
 
-    def getShapesInStructure(self, lpp, structure):
+    def getShapesInStructure(self, lpp, structureName):
         """
         Go through all the shapes in a structure and
-        return the list of shapes in
-        the form [llx, lly, urx, ury] for rectangles
-        and [coordinate 1, coordinate 2,...] for polygons.
+        return a list for each placement of the structure of the shapes in
+        the form (llx, lly, urx, ury) for rectangles
+        and (coordinate 1, coordinate 2,...) for polygons.
+        All the placements are transformed at once.
         """
-        (structureName, structureOrigin,
-         structureuVector, structurevVector) = structure
-        # print(structureName,
-        # "u", structureuVector.transpose(),
-        # "v",structurevVector.transpose(),
-        # "o",structureOrigin.transpose())
-        boundaries = []
+        (originVectors, uVectors, vVectors) = self.xyArrays[structureName]
+        (originX, originY) = (originVectors[:, 0], originVectors[:, 1])
+        (uX, uY) = (uVectors[:, 0], uVectors[:, 1])
+        (vX, vY) = (vVectors[:, 0], vVectors[:, 1])
+
+        # Each column has the shape in every placement
+        columns = []
+        rectangles = []
         for boundary in self.structures[str(structureName)].boundaries:
             if sameLPP((boundary.drawingLayer, boundary.purposeLayer),
                        lpp):
                 if len(boundary.coordinates) != 5:
                     # if shape is a polygon (used in DFF)
-                    boundaryPolygon = []
                     # Polygon is a list of coordinates going ccw
-                    for coord in range(0, len(boundary.coordinates)):
-                        boundaryPolygon.append(boundary.coordinates[coord][0])
-                        boundaryPolygon.append(boundary.coordinates[coord][1])
-                    # perform the rotation
-                    boundaryPolygon = self.transformPolygon(boundaryPolygon,
-                                                            structureuVector,
-                                                            structurevVector)
-                    # add the offset
-                    polygon = []
-                    for i in range(0, len(boundaryPolygon), 2):
-                        polygon.append(boundaryPolygon[i] + structureOrigin[0].item())
-                        polygon.append(boundaryPolygon[i+1] + structureOrigin[1].item())
-                    # make it a tuple
-                    polygon = tuple(polygon)
-                    boundaries.append(polygon)
+                    polygon = np.array(boundary.coordinates, dtype=float)
+                    # perform the rotation and add the offset
+                    x = polygon[:, 0] * uX + polygon[:, 1] * vX + originX
+                    y = polygon[:, 0] * uY + polygon[:, 1] * vY + originY
+                    polygons = np.stack((x, y), axis=-1).reshape(len(originVectors), -1)
+                    columns.append(list(map(tuple, polygons.tolist())))
                 else:
                     # else shape is a rectangle
+                    # Rectangle is [leftx, bottomy, rightx, topy].
                     left_bottom = boundary.coordinates[0]
                     right_top = boundary.coordinates[2]
-                    # Rectangle is [leftx, bottomy, rightx, topy].
-                    boundaryRect = [left_bottom[0], left_bottom[1],
-                                    right_top[0], right_top[1]]
-                    # perform the rotation
-                    boundaryRect = self.transformRectangle(boundaryRect,
-                                                           structureuVector,
-                                                           structurevVector)
-                    # add the offset and make it a tuple
-                    boundaryRect = (boundaryRect[0]+structureOrigin[0].item(),
-                                    boundaryRect[1]+structureOrigin[1].item(),
-                                    boundaryRect[2]+structureOrigin[0].item(),
-                                    boundaryRect[3]+structureOrigin[1].item())
-                    boundaries.append(boundaryRect)
-        return boundaries
-
+                    rectangles.append([left_bottom[0], left_bottom[1],
+                                       right_top[0], right_top[1]])
+                    # placeholder until all the rectangles are transformed
+                    columns.append(len(rectangles) - 1)
+
+        if rectangles:
+            rectangles = np.array(rectangles, dtype=float)
+            # perform the rotation of the corners
+            x1 = rectangles[:, 0] * uX + rectangles[:, 1] * vX
+            y1 = rectangles[:, 0] * uY + rectangles[:, 1] * vY
+            x2 = rectangles[:, 2] * uX + rectangles[:, 3] * vX
+            y2 = rectangles[:, 2] * uY + rectangles[:, 3] * vY
+            # recompute the left, bottom, right, top and add the offset
+            transformed = np.stack((np.minimum(x1, x2) + originX,
+                                    np.minimum(y1, y2) + originY,
+                                    np.maximum(x1, x2) + originX,
+                                    np.maximum(y1, y2) + originY), axis=-1)
+            rectangleColumns = [list(map(tuple, column)) for column in transformed.transpose(1, 0, 2).tolist()]
+            columns = [rectangleColumns[column] if isinstance(column, int) else column for column in columns]
+
+        return [list(shapes) for shapes in zip(*columns)] or [[] for index in range(len(originVectors))]
 
     def transformPolygon(self,originalPolygon,uVector,vVector):
         """
@@ -384,6 +384,7 @@ def end_openram():
 
     if OPTS.check_lvsdrc:
         import verify
+        verify.wait_drc_lvs()
         verify.print_drc_stats()
         verify.print_lvs_stats()
         verify.print_pex_stats()
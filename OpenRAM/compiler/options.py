@@ -89,6 +89,8 @@ class options(optparse.Values):
     use_specified_corners = None
     # Allows specification of model data
     sim_data_path = None
+    # Directory of the fitted regression models (None trains them in every run)
+    model_store_path = None
     # A list of load/slew tuples
     use_specified_load_slew = None
 
@@ -102,10 +104,29 @@ class options(optparse.Values):
     # Whether we should do the final power routing
     route_supplies = "tree"
     supply_pin_type = "ring"
+    # Routing grid storage: "sparse" creates the grid cells on demand
+    # while "dense" uses packed arrays over the routing bounding box
+    route_grid = "sparse"
+    # Maze search: "astar" grows from the source and "bidirectional" grows
+    # from both the source and target and jumps along the preferred direction.
+    # The grids passed over in a jump are not expanded so the bidirectional
+    # search may return costlier paths than "astar".
+    route_search = "astar"
     # This determines whether LVS and DRC is checked at all.
     check_lvsdrc = False
     # This determines whether LVS and DRC is checked for every submodule.
     inline_lvsdrc = False
+    # Run the inline DRC/LVS of the modules in num_threads processes while
+    # the layout generation continues. The failures are reported before the
+    # final verification unless fail fast reports them as they finish.
+    inline_lvsdrc_parallel = False
+    inline_lvsdrc_fail_fast = False
+    # Kill a DRC/LVS/PEX script after this many seconds (None never kills it)
+    script_timeout = None
+    # Directory of DRC/LVS results that are reused for unchanged cells (None disables it)
+    verify_cache = None
+    # Directory of the pickled library GDS cells (None parses them in every run)
+    gds_cache_path = None
     # Remove noncritical memory cells for characterization speed-up
     trim_netlist = True
     # Run with extracted parasitics
@@ -0,0 +1,218 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import numpy as np
+from vector3d import vector3d
+from grid_cell import grid_cell
+from sparse_grid_map import sparse_grid_map
+
+
+class dense_grid_map:
+    """
+    A map of the routing grids stored as packed arrays over the bounding box.
+    Each grid has a uint8 of flag bits and a minimum cost. Grids outside
+    of the bounding box (e.g. perimeter pins or rings) are kept in a
+    sparse map.
+    """
+    FLAGS = {"blocked": 1,
+             "path": 2,
+             "source": 4,
+             "target": 8}
+
+    def __init__(self, ll, ur, halo=0):
+        self.ll = vector3d(ll.x - halo, ll.y - halo, 0)
+        self.ur = vector3d(ur.x + halo, ur.y + halo, 1)
+        self.shape = (2, self.ur.x - self.ll.x + 1, self.ur.y - self.ll.y + 1)
+
+        self.flags = np.zeros(self.shape, dtype=np.uint8)
+        # -1 means it isn't visited yet
+        self.min_cost = np.full(self.shape, -1, dtype=np.int32)
+        # Flat views of the same memory for fast single grid access
+        self.flag_view = memoryview(self.flags.reshape(-1))
+        self.cost_view = memoryview(self.min_cost.reshape(-1))
+
+        # Grids outside of the bounding box
+        self.fallback = sparse_grid_map()
+
+    def index(self, n):
+        """
+        Return the flat array index of a grid or None if it is outside the arrays.
+        """
+        i = n.x - self.ll.x
+        j = n.y - self.ll.y
+        if 0 <= i < self.shape[1] and 0 <= j < self.shape[2] and 0 <= n.z <= 1:
+            return (n.z * self.shape[1] + i) * self.shape[2] + j
+        return None
+
+    def __contains__(self, n):
+        return self.index(n) is not None or n in self.fallback
+
+    def __getitem__(self, n):
+        index = self.index(n)
+        if index is None:
+            return self.fallback[n]
+        return dense_grid_cell(self, index)
+
+    def __iter__(self):
+        """
+        Iterate the grids that have any information in them.
+        """
+        used = (self.flags != 0) | (self.min_cost != -1)
+        for (z, i, j) in zip(*np.nonzero(used)):
+            yield vector3d(int(i) + self.ll.x, int(j) + self.ll.y, int(z))
+        yield from self.fallback
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        for n in self:
+            yield self[n]
+
+    def items(self):
+        for n in self:
+            yield (n, self[n])
+
+    def add(self, n):
+        if self.index(n) is None:
+            self.fallback.add(n)
+
+    def set_flag(self, n, flag, value=True):
+        index = self.index(n)
+        if index is None:
+            self.fallback.set_flag(n, flag, value)
+        elif value:
+            self.flag_view[index] |= self.FLAGS[flag]
+        else:
+            self.flag_view[index] &= ~self.FLAGS[flag] & 0xFF
+
+    def get_flag(self, n, flag):
+        index = self.index(n)
+        if index is None:
+            return self.fallback.get_flag(n, flag)
+        return bool(self.flag_view[index] & self.FLAGS[flag])
+
+    def set_flags(self, points, flag, value=True):
+        """
+        Set the flag on a collection of grids with a single array update.
+        """
+        coords = np.array([(n.z, n.x, n.y) for n in points], dtype=np.int64).reshape(-1, 3)
+        z = coords[:, 0]
+        i = coords[:, 1] - self.ll.x
+        j = coords[:, 2] - self.ll.y
+        inside = (i >= 0) & (i < self.shape[1]) & (j >= 0) & (j < self.shape[2]) & (z >= 0) & (z <= 1)
+
+        if value:
+            self.flags[z[inside], i[inside], j[inside]] |= self.FLAGS[flag]
+        else:
+            self.flags[z[inside], i[inside], j[inside]] &= ~np.uint8(self.FLAGS[flag])
+
+        for (nz, nx, ny) in coords[~inside]:
+            self.fallback.set_flag(vector3d(int(nx), int(ny), int(nz)), flag, value)
+
+    def set_rect(self, ll, ur, flag, value=True):
+        """
+        Set the flag on all grids in the rectangle from ll to ur (inclusive)
+        on the layer of ll.
+        """
+        z = ll.z
+        i0 = max(ll.x - self.ll.x, 0)
+        i1 = min(ur.x - self.ll.x, self.shape[1] - 1)
+        j0 = max(ll.y - self.ll.y, 0)
+        j1 = min(ur.y - self.ll.y, self.shape[2] - 1)
+        if 0 <= z <= 1 and i0 <= i1 and j0 <= j1:
+            window = self.flags[z, i0:i1 + 1, j0:j1 + 1]
+            if value:
+                window |= self.FLAGS[flag]
+            else:
+                window &= ~np.uint8(self.FLAGS[flag])
+        else:
+            i0 = j0 = 0
+            i1 = j1 = -1
+
+        # Any part of the rectangle outside of the arrays
+        for x in range(ll.x, ur.x + 1):
+            for y in range(ll.y, ur.y + 1):
+                if i0 <= x - self.ll.x <= i1 and j0 <= y - self.ll.y <= j1:
+                    continue
+                self.fallback.set_flag(vector3d(x, y, z), flag, value)
+
+    def clear_flag(self, flag):
+        self.flags &= ~np.uint8(self.FLAGS[flag])
+        self.fallback.clear_flag(flag)
+
+    def get_min_cost(self, n):
+        index = self.index(n)
+        if index is None:
+            return self.fallback.get_min_cost(n)
+        return self.cost_view[index]
+
+    def set_min_cost(self, n, cost):
+        index = self.index(n)
+        if index is None:
+            self.fallback.set_min_cost(n, cost)
+        else:
+            self.cost_view[index] = cost
+
+    def clear_min_cost(self):
+        """
+        Reset only the search cost of all the grids.
+        """
+        self.min_cost.fill(-1)
+        self.fallback.clear_min_cost()
+
+    def reset(self):
+        """
+        Reset the dynamic routing info of all the grids.
+        This keeps the path flags like grid_cell.reset.
+        """
+        self.flags &= self.FLAGS["path"]
+        self.min_cost.fill(-1)
+        self.fallback.reset()
+
+
+class dense_grid_cell(grid_cell):
+    """
+    A view of a single grid in the dense map so that debug code
+    can use it like a grid_cell.
+    """
+
+    def __init__(self, grid_map, index):
+        self.grid_map = grid_map
+        self.index = index
+
+    def get_flag(self, flag):
+        return bool(self.grid_map.flag_view[self.index] & dense_grid_map.FLAGS[flag])
+
+    def set_flag(self, flag, value):
+        if value:
+            self.grid_map.flag_view[self.index] |= dense_grid_map.FLAGS[flag]
+        else:
+            self.grid_map.flag_view[self.index] &= ~dense_grid_map.FLAGS[flag] & 0xFF
+
+    blocked = property(lambda self: self.get_flag("blocked"),
+                       lambda self, value: self.set_flag("blocked", value))
+    path = property(lambda self: self.get_flag("path"),
+                    lambda self, value: self.set_flag("path", value))
+    source = property(lambda self: self.get_flag("source"),
+                      lambda self, value: self.set_flag("source", value))
+    target = property(lambda self: self.get_flag("target"),
+                      lambda self, value: self.set_flag("target", value))
+
+    @property
+    def min_cost(self):
+        return self.grid_map.cost_view[self.index]
+
+    @min_cost.setter
+    def min_cost(self, value):
+        self.grid_map.cost_view[self.index] = value
+
+    def reset(self):
+        self.min_cost = -1
+        self.blocked = False
+        self.source = False
+        self.target = False
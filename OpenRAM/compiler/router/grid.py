@@ -6,8 +6,10 @@
 # All rights reserved.
 #
 import debug
+from globals import OPTS
 from vector3d import vector3d
-from grid_cell import grid_cell
+from sparse_grid_map import sparse_grid_map
+from dense_grid_map import dense_grid_map
 
 
 class grid:
@@ -21,6 +23,8 @@ class grid:
     VIA_COST = 2
     NONPREFERRED_COST = 4
     PREFERRED_COST = 1
+    # extra grids around the bbox in the dense map (e.g. for supply rings)
+    DENSE_HALO = 16
 
     def __init__(self, ll, ur, track_width):
         """ Initialize the map and define the costs. """
@@ -40,8 +44,27 @@ class grid:
         debug.info(1, "BBOX coords: ll=" + str(ll) + " ur=" + str(ur))
         debug.info(1, "BBOX grids: ll=" + str(self.ll) + " ur=" + str(self.ur))
 
-        # let's leave the map sparse, cells are created on demand to reduce memory
-        self.map={}
+        if OPTS.route_grid == "dense":
+            # packed arrays over the bbox with a margin for the perimeter pins
+            self.map = dense_grid_map(self.ll, self.ur, grid.DENSE_HALO)
+        else:
+            # let's leave the map sparse, cells are created on demand to reduce memory
+            self.map = sparse_grid_map()
+
+    @staticmethod
+    def step_cost(p0, p1):
+        """
+        The cost of moving from one grid to an adjacent one. This is
+        a via, a preferred or a non-preferred direction move.
+        """
+        if p0.z != p1.z: # via
+            return grid.VIA_COST
+        elif p0.x != p1.x and p0.z==1: # horizontal on vertical layer
+            return grid.NONPREFERRED_COST
+        elif p0.y != p1.y and p0.z==0: # vertical on horizontal layer
+            return grid.NONPREFERRED_COST
+        else:
+            return grid.PREFERRED_COST
 
     def add_all_grids(self):
         for x in range(self.ll.x, self.ur.x, 1):
@@ -51,11 +74,9 @@ class grid:
 
     def set_blocked(self, n, value=True):
         if not isinstance(n, vector3d):
-            for item in n:
-                self.set_blocked(item, value)
+            self.map.set_flags(self.flatten(n), "blocked", value)
         else:
-            self.add_map(n)
-            self.map[n].blocked=value
+            self.map.set_flag(n, "blocked", value)
 
     def is_blocked(self, n):
         if not isinstance(n, vector3d):
@@ -65,24 +86,35 @@ class grid:
             else:
                 return False
         else:
-            self.add_map(n)
-            return self.map[n].blocked
+            return self.map.get_flag(n, "blocked")
 
     def set_path(self, n, value=True):
         if isinstance(n, (list, tuple, set, frozenset)):
-            for item in n:
-                self.set_path(item, value)
+            self.map.set_flags(self.flatten(n), "path", value)
         else:
-            self.add_map(n)
-            self.map[n].path=value
+            self.map.set_flag(n, "path", value)
+
+    def set_rect(self, ll, ur, flag="blocked", value=True):
+        """
+        Set or clear a flag (blocked, path, source or target) on all grids
+        in the rectangle from ll to ur (inclusive) on the layer of ll.
+        """
+        self.map.set_rect(ll, ur, flag, value)
+
+    def flatten(self, n):
+        """
+        Return the grids in a (nested) collection of grids.
+        """
+        if isinstance(n, vector3d):
+            return [n]
+        return [x for item in n for x in self.flatten(item)]
 
     def clear_blockages(self):
-        for k in self.map:
-            self.map[k].blocked=False
+        self.map.clear_flag("blocked")
 
     def clear_source(self):
-        for k in self.map:
-            self.map[k].source=False
+        # Only the grids in the source set have the flag
+        self.map.set_flags(self.source, "source", False)
         self.source = set()
 
     def set_source(self, n):
@@ -90,26 +122,24 @@ class grid:
             for item in n:
                 self.set_source(item)
         else:
-            self.add_map(n)
-            self.map[n].source=True
-            self.map[n].blocked=False
+            self.map.set_flag(n, "source", True)
+            self.map.set_flag(n, "blocked", False)
             self.source.add(n)
 
     def clear_target(self):
-        for k in self.map:
-            self.map[k].target=False
+        # Only the grids in the target set have the flag
+        self.map.set_flags(self.target, "target", False)
         self.target = set()
-        
+
     def set_target(self, n):
         if not isinstance(n, vector3d):
             for item in n:
                 self.set_target(item)
         else:
-            self.add_map(n)
-            self.map[n].target=True
-            self.map[n].blocked=False
+            self.map.set_flag(n, "target", True)
+            self.map.set_flag(n, "blocked", False)
             self.target.add(n)
-            
+
     def add_source(self, track_list):
         debug.info(3, "Adding source list={0}".format(str(track_list)))
         for n in track_list:
@@ -193,8 +223,7 @@ class grid:
             for item in n:
                 self.add_map(item)
         else:
-            if n not in self.map:
-                self.map[n]=grid_cell()
+            self.map.add(n)
 
     def block_path(self, path):
         """
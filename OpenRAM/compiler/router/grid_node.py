@@ -0,0 +1,42 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from grid_path import grid_path
+
+
+class grid_node:
+    """
+    A search node for the A* router. Each node only keeps the grid
+    it is at, the node it came from and the cost so far. The
+    nodes are shared between all the paths in the queue so that
+    the path is only rebuilt when the target is found.
+    """
+    __slots__ = ("point", "parent", "cost")
+
+    def __init__(self, point, parent=None, cost=0):
+        self.point = point
+        self.parent = parent
+        self.cost = cost
+
+    def __str__(self):
+        return "node({0}, cost={1})".format(self.point, self.cost)
+
+    def get_path(self):
+        """
+        Follow the parent pointers back to the source and return
+        the equivalent (1 track wide) grid_path.
+        """
+        points = []
+        node = self
+        while node:
+            points.append(node.point)
+            node = node.parent
+        points.reverse()
+
+        path = grid_path()
+        path.extend([[p] for p in points])
+        return path
@@ -143,15 +143,7 @@ class grid_path:
             # This is because they are "waves" so pick the first item
             p0=p0list[0]
             p1=p1list[0]
-
-            if p0.z != p1.z: # via
-                cost += grid.VIA_COST
-            elif p0.x != p1.x and p0.z==1: # horizontal on vertical layer
-                cost += grid.NONPREFERRED_COST
-            elif p0.y != p1.y and p0.z==0: # vertical on horizontal layer
-                cost += grid.NONPREFERRED_COST
-            else:
-                cost += grid.PREFERRED_COST
+            cost += grid.step_cost(p0, p1)
 
         return cost
 
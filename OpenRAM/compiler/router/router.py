@@ -496,6 +496,11 @@ class router(router_tech):
         Recursive find boundaries as blockages to the routing grid.
         """
 
+        # Only the pins around the lower left of a shape can contain it
+        pin_list = list(self.all_pins)
+        pin_index = gdsMill.ShapeIndex([[pin.ll().x, pin.ll().y, pin.ur().x, pin.ur().y] for pin in pin_list],
+                                       pin_list)
+
         shapes = self.layout.getAllShapes(lpp)
         for boundary in shapes:
             ll = vector(boundary[0], boundary[1])
@@ -507,11 +512,13 @@ class router(router_tech):
             
             # If there is a rectangle that is the same in the pins,
             # it isn't a blockage!
-            if new_shape not in self.all_pins and not self.pin_contains(new_shape):
+            if new_shape not in self.all_pins and not self.pin_contains(new_shape, pin_index.queryPoint(ll)):
                 self.blockages.append(new_shape)
 
-    def pin_contains(self, shape):
-        for pin in self.all_pins:
+    def pin_contains(self, shape, pin_list=None):
+        if pin_list is None:
+            pin_list = self.all_pins
+        for pin in pin_list:
             if pin.contains(shape):
                 return True
         return False
@@ -921,6 +928,7 @@ class router(router_tech):
         debug.check(len(pg.pins)==1, "Too many pins for a side supply.")
 
         self.cell.pin_map[name].update(pg.pins)
+        self.cell.invalidate_blockages()
         self.pin_groups[name].append(pg)
 
         self.new_pins[name] = pg.pins
@@ -981,6 +989,7 @@ class router(router_tech):
         pg.pins = set(pg.enclosures)
         
         self.cell.pin_map[name].update(pg.pins)
+        self.cell.invalidate_blockages()
         self.pin_groups[name].append(pg)
         self.new_pins[name] = pg.pins
 
@@ -1156,28 +1165,61 @@ class router(router_tech):
             newpath.append(path[-1])
         return newpath
 
+    def get_detour_scales(self):
+        """
+        Return the increasing detour scales of the route cost bound to try.
+        The bidirectional search stops as soon as no cheaper path is left
+        under the bound, so it only tries the largest one.
+        """
+        detour_scales = [5 * pow(2, x) for x in range(5)]
+        if OPTS.route_search == "bidirectional":
+            return detour_scales[-1:]
+        return detour_scales
+
     def run_router(self, detour_scale):
         """
         This assumes the blockages, source, and target are all set up.
         """
 
+        route = self.search_route(detour_scale)
+        if route:
+            self.commit_route(route)
+            return True
+        else:
+            return False
+
+    def search_route(self, detour_scale):
+        """
+        Find a route from the source to the target without adding it
+        to the design. Returns the (tracks, path) of the route where the
+        path is None if a source is already a target, or None if there
+        is no route.
+        """
         # Double check source and taget are not same node, if so, we are done!
-        for k, v in self.rg.map.items():
-            if v.source and v.target:
-                self.paths.append([k])
-                return True
+        for k in self.rg.source & self.rg.target:
+            return ([k], None)
 
         # returns the path in tracks
-        (path, cost) = self.rg.route(detour_scale)
+        if OPTS.route_search == "bidirectional":
+            (path, cost) = self.rg.route_bidirectional(detour_scale)
+        else:
+            (path, cost) = self.rg.route(detour_scale)
         if path:
             debug.info(2, "Found path: cost={0} {1}".format(cost, str(path)))
+            return (grid_utils.flatten_set(path), path)
+        else:
+            return None
 
-            self.paths.append(grid_utils.flatten_set(path))
+    def commit_route(self, route):
+        """
+        Add a route from search_route to the paths, the path blockages
+        and the design.
+        """
+        (tracks, path) = route
+        self.paths.append(tracks)
+        if path:
             self.add_route(path)
-            self.path_blockages.append(self.paths[-1])
-            return True
-        else:
-            return False
+            self.path_blockages.append(tracks)
 
     def annotate_pin_and_tracks(self, pin, tracks):
         """"
@@ -1265,6 +1307,7 @@ class router(router_tech):
         debug.info(2, "Erasing router info")
         lpp = techlayer["text"]
         self.cell.objs = [x for x in self.cell.objs if x.lpp != lpp]
+        self.cell.invalidate_blockages()
 
     def add_router_info(self):
         """
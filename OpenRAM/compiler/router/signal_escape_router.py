@@ -6,7 +6,8 @@
 # All rights reserved.
 #
 import debug
-from globals import print_time
+import multiprocessing
+from globals import OPTS, print_time
 from router import router
 from datetime import datetime
 from signal_grid import signal_grid
@@ -16,6 +17,9 @@ class signal_escape_router(router):
     """
     A router that routes signals to perimeter and makes pins.
     """
+    # The width and height in tracks of the tiles of the routing bbox.
+    # Pins that escape through different tiles are routed concurrently.
+    TILE_TRACKS = 16
 
     def __init__(self, layers, design, bbox=None, margin=0):
         """
@@ -56,10 +60,13 @@ class signal_escape_router(router):
         # Route the supply pins to the supply rails
         # Route vdd first since we want it to be shorter
         start_time = datetime.now()
-        for pin_name in ordered_pin_names:
-            self.route_signal(pin_name)
-            # if pin_name == "dout0[1]":
-            #     self.write_debug_gds("postroute.gds", True)
+        if OPTS.num_threads > 1 and not multiprocessing.current_process().daemon:
+            self.route_signals_parallel(ordered_pin_names)
+        else:
+            for pin_name in ordered_pin_names:
+                self.route_signal(pin_name)
+                # if pin_name == "dout0[1]":
+                #     self.write_debug_gds("postroute.gds", True)
             
         print_time("Maze routing pins",datetime.now(), start_time, 3)
 
@@ -68,8 +75,20 @@ class signal_escape_router(router):
         return True
 
     def route_signal(self, pin_name, side="all"):
-        
-        for detour_scale in [5 * pow(2, x) for x in range(5)]:
+        """ Route a pin to the perimeter and move the pin there. """
+        route = self.search_signal(pin_name, side)
+        if route:
+            self.commit_signal(pin_name, route)
+            return
+
+        self.write_debug_gds("debug_route.gds", True)
+
+    def search_signal(self, pin_name, side="all"):
+        """
+        Find the route of a pin to the perimeter with increasing detour
+        scales. The route is not added to the design.
+        """
+        for detour_scale in self.get_detour_scales():
             debug.info(1, "Escape routing {0} with scale {1}".format(pin_name, detour_scale))
             
             # Clear everything in the routing grid.
@@ -92,15 +111,112 @@ class signal_escape_router(router):
             #     breakpoint()
             
             # Actually run the A* router
-            if self.run_router(detour_scale=detour_scale):
-                new_pin = self.get_perimeter_pin()
-                self.cell.replace_layout_pin(pin_name, new_pin)
-                return
+            route = self.search_route(detour_scale)
+            if route:
+                return route
 
             # if pin_name == "dout0[3]":
             #     self.write_debug_gds("pre_route.gds", False)
             #     breakpoint()
-                
-        self.write_debug_gds("debug_route.gds", True)
+
+        return None
+
+    def commit_signal(self, pin_name, route):
+        """
+        Add the route of a pin to the design and move the pin to the perimeter.
+        """
+        self.commit_route(route)
+        new_pin = self.get_perimeter_pin()
+        self.cell.replace_layout_pin(pin_name, new_pin)
+
+    def get_escape_tiles(self, pin_name):
+        """
+        Return the tiles of the region from the pin to the closest side
+        of the routing bbox where its route is expected to be.
+        """
+        grids = [g for pg in self.pin_groups[pin_name] for g in pg.grids]
+        (ll, ur) = (self.rg.ll, self.rg.ur)
+        left = min(g.x for g in grids)
+        right = max(g.x for g in grids)
+        bottom = min(g.y for g in grids)
+        top = max(g.y for g in grids)
+
+        # Extend the pin to the closest side like perimeter_dist
+        side_dist = [left - ll.x, ur.x - right, bottom - ll.y, ur.y - top]
+        side = side_dist.index(min(side_dist))
+        if side == 0:
+            left = ll.x
+        elif side == 1:
+            right = ur.x
+        elif side == 2:
+            bottom = ll.y
+        else:
+            top = ur.y
+
+        size = signal_escape_router.TILE_TRACKS
+        return {(x, y)
+                for x in range((left - ll.x) // size, (right - ll.x) // size + 1)
+                for y in range((bottom - ll.y) // size, (top - ll.y) // size + 1)}
+
+    def route_signals_parallel(self, ordered_pin_names):
+        """
+        Route the pins in batches of pins with disjoint escape tiles in a
+        pool of worker processes. Each batch is routed with the blockages of
+        the previous batches and the routes are committed in the pin order.
+        A route that crosses an earlier route of its batch or fails is
+        routed again serially with all of the blockages.
+        """
+        global parallel_router
+
+        # Each pin is in the batch after the last batch of an earlier pin
+        # that uses one of its tiles
+        batches = []
+        tile_batch = {}
+        for pin_name in ordered_pin_names:
+            tiles = self.get_escape_tiles(pin_name)
+            index = max((tile_batch.get(x, -1) for x in tiles), default=-1) + 1
+            if index == len(batches):
+                batches.append([])
+            batches[index].append(pin_name)
+            tile_batch.update((x, index) for x in tiles)
+
+        num_workers = min(OPTS.num_threads, max(len(x) for x in batches))
+        debug.info(1, "Escape routing {0} pins in {1} batches with {2} processes.".format(len(ordered_pin_names),
+                                                                                         len(batches),
+                                                                                         num_workers))
+        # The workers are forked so they share the pins and blockages without pickling
+        # and only get the paths that were routed since then.
+        parallel_router = self
+        self.num_forked_paths = len(self.path_blockages)
+        # get_perimeter_pin needs the perimeter as the target
+        # (which the serial routes also leave as the target)
+        self.rg.clear_target()
+        self.add_perimeter_target()
+        with multiprocessing.get_context("fork").Pool(num_workers) as pool:
+            for batch in batches:
+                new_paths = self.path_blockages[self.num_forked_paths:]
+                routes = pool.map(search_signal_worker, [(pin_name, new_paths) for pin_name in batch])
+
+                batch_grids = set()
+                for (pin_name, route) in zip(batch, routes):
+                    if route and batch_grids.isdisjoint(route[0]):
+                        self.commit_signal(pin_name, route)
+                    else:
+                        debug.info(2, "Routing {} again serially.".format(pin_name))
+                        self.route_signal(pin_name)
+                    batch_grids.update(self.paths[-1])
+        parallel_router = None
+
+    def search_parallel_signal(self, pin_name, new_paths):
+        """ Find the route of a pin in a worker process. """
+        self.path_blockages = self.path_blockages[:self.num_forked_paths] + new_paths
+        return self.search_signal(pin_name)
+
+
+# The router of the escape routing worker processes
+parallel_router = None
 
 
+def search_signal_worker(args):
+    """ Process pool entry to find the route of a pin. """
+    return parallel_router.search_parallel_signal(*args)
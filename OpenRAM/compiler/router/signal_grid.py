@@ -6,10 +6,12 @@
 # All rights reserved.
 #
 import debug
+import math
 from heapq import heappush,heappop
-from copy import deepcopy
 
+from direction import direction
 from grid import grid
+from grid_node import grid_node
 from grid_path import grid_path
 from vector3d import vector3d
 
@@ -23,12 +25,24 @@ class signal_grid(grid):
         """ Create a routing map of width x height cells and 2 in the z-axis. """
         grid.__init__(self, ll, ur, track_factor)
 
+        # The planar and via offsets to expand a node
+        self.offsets = direction.cardinal_offsets(True)
+
     def reinit(self):
         """ Reinitialize everything for a new route. """
 
         # Reset all the cells in the map
-        for p in self.map.values():
-            p.reset()
+        self.map.reset()
+
+        self.clear_source()
+        self.clear_target()
+
+    def reinit_search(self):
+        """
+        Reinitialize the search costs, source and target for a new route
+        but keep the blockages.
+        """
+        self.map.clear_min_cost()
 
         self.clear_source()
         self.clear_target()
@@ -36,7 +50,7 @@ class signal_grid(grid):
     def init_queue(self):
         """
         Populate the queue with all the source pins with cost
-        to the target. Each item is a path of the grid cells.
+        to the target. Each item is a search node of a grid cell.
         We will use an A* search, so this cost must be pessimistic.
         Cost so far will be the length of the path.
         """
@@ -47,13 +61,16 @@ class signal_grid(grid):
         for s in self.source:
             cost = self.cost_to_target(s)
             debug.info(3, "Init: cost=" + str(cost) + " " + str([s]))
-            heappush(self.q, (cost, self.counter, grid_path([vector3d(s)])))
+            self.map.set_min_cost(s, cost)
+            heappush(self.q, (cost, self.counter, grid_node(vector3d(s))))
             self.counter += 1
 
     def route(self, detour_scale):
         """
         This does the A* maze routing with preferred direction routing.
         This only works for 1 track wide routes!
+        The queue holds search nodes with a parent pointer and the cost so far
+        so that paths are shared and only rebuilt once the target is found.
         """
 
         # We set a cost bound of the HPWL for run-time. This can be
@@ -69,60 +86,214 @@ class signal_grid(grid):
         # Put the source items into the queue
         self.init_queue()
 
+        # The grids that have already been expanded with their lowest cost
+        closed = set()
+
         # Keep expanding and adding to the priority queue until we are done
         while len(self.q)>0:
-            # should we keep the path in the queue as well or just the final node?
-            (cost, count, curpath) = heappop(self.q)
+            (cost, count, curnode) = heappop(self.q)
+            # Skip the stale entries of grids that were already expanded with a lower cost
+            if curnode.point in closed:
+                continue
+            closed.add(curnode.point)
             debug.info(3, "Queue size: size=" + str(len(self.q)) + " " + str(cost))
-            debug.info(4, "Expanding: cost=" + str(cost) + " " + str(curpath))
+            debug.info(4, "Expanding: cost=" + str(cost) + " " + str(curnode))
 
             # expand the last element
-            neighbors =  self.expand_dirs(curpath)
+            neighbors = self.expand_node(curnode)
             debug.info(4, "Neighbors: " + str(neighbors))
 
             for n in neighbors:
-                # make a new copy of the path to not update the old ones
-                newpath = deepcopy(curpath)
-                # node is added to the map by the expand routine
-                newpath.append(n)
+                current_cost = curnode.cost + grid.step_cost(curnode.point, n)
                 # check if we hit the target and are done
-                if self.is_target(n[0]): # This uses the [0] item because we are assuming 1-track wide
-                    return (newpath, newpath.cost())
+                if self.is_target(n):
+                    newnode = grid_node(n, curnode, current_cost)
+                    return (newnode.get_path(), current_cost)
                 else:
                     # current path cost + predicted cost
-                    current_cost = newpath.cost()
-                    target_cost = self.cost_to_target(n[0])
-                    predicted_cost = current_cost +  target_cost
+                    target_cost = self.cost_to_target(n)
+                    predicted_cost = current_cost + target_cost
                     # only add the cost if it is less than our bound
                     if (predicted_cost < cost_bound):
-                        if (self.map[n[0]].min_cost==-1 or predicted_cost<self.map[n[0]].min_cost):
-                            self.map[n[0]].min_path = newpath
-                            self.map[n[0]].min_cost = predicted_cost
-                            debug.info(4, "Enqueuing: cost=" + str(current_cost) + "+" + str(target_cost) + " " + str(newpath))
+                        min_cost = self.map.get_min_cost(n)
+                        if (min_cost==-1 or predicted_cost<min_cost):
+                            self.map.set_min_cost(n, predicted_cost)
+                            # Re-open the grid since we found a cheaper way to it
+                            closed.discard(n)
+                            newnode = grid_node(n, curnode, current_cost)
+                            debug.info(4, "Enqueuing: cost=" + str(current_cost) + "+" + str(target_cost) + " " + str(newnode))
                             # add the cost to get to this point if we haven't reached it yet
-                            heappush(self.q, (predicted_cost, self.counter, newpath))
+                            heappush(self.q, (predicted_cost, self.counter, newnode))
                             self.counter += 1
-                        #else:
-                        #    print("Better previous cost.")
-                    #else:
-                    #    print("Cost bounded")
 
         return (None, None)
 
-    def expand_dirs(self, curpath):
+    def route_bidirectional(self, detour_scale):
+        """
+        This does a bidirectional A* maze routing that grows from both the
+        source and the target until no path through a grid that both
+        searches reached can be cheaper. The costs are the same as route.
+        Moves in the preferred direction of a layer keep going over the
+        grids that have the same side openings as the grid before them.
+        Those grids are reached but not put in the queue, so turns and vias
+        at them are only found through other grids. The jumps therefore may
+        return a costlier path than route.
+        """
+        any_source_element = next(iter(self.source))
+        cost_bound = detour_scale * self.cost_to_target(any_source_element) * grid.PREFERRED_COST
+
+        # Check if something in the queue is already a source and a target!
+        for s in self.source:
+            if self.is_target(s):
+                return((grid_path([vector3d(s)]), 0))
+
+        # The forward search is from the source and the backward search is
+        # from the target. Each has its own queue and the best node of the
+        # grids it reached.
+        self.ends = [self.source, self.target]
+        queues = [[], []]
+        nodes = [{}, {}]
+        closed = [set(), set()]
+        # The lines of the other end where a jump stops so that it can turn
+        self.jump_stops = [({t.x for t in self.target}, {t.y for t in self.target}),
+                           ({s.x for s in self.source}, {s.y for s in self.source})]
+        self.counter = 0
+        for side in range(2):
+            for s in self.ends[side]:
+                node = grid_node(vector3d(s))
+                nodes[side][node.point] = node
+                heappush(queues[side], (self.cost_to_set(s, self.ends[1 - side]), self.counter, node))
+                self.counter += 1
+
+        # The cost and the meeting nodes of the best path so far
+        best = (math.inf, None, None)
+        while queues[0] and queues[1]:
+            # With admissible costs to go, a path that isn't found yet
+            # costs at least the lowest cost in each queue
+            if queues[0][0][0] >= best[0] or queues[1][0][0] >= best[0]:
+                break
+
+            # Grow the search with the smaller frontier
+            side = 0 if len(queues[0]) <= len(queues[1]) else 1
+            (cost, count, curnode) = heappop(queues[side])
+            # Skip the stale entries of grids that were already expanded with a lower cost
+            if curnode.point in closed[side]:
+                continue
+            closed[side].add(curnode.point)
+            debug.info(4, "Expanding {0}: cost={1} {2}".format(side, cost, curnode))
+
+            for (newnode, queued) in self.jump_node(curnode, side, nodes[side], cost_bound):
+                n = newnode.point
+                known = nodes[side].get(n)
+                if known and known.cost <= newnode.cost:
+                    continue
+                nodes[side][n] = newnode
+                # Re-open the grid since we found a cheaper way to it
+                closed[side].discard(n)
+
+                other = nodes[1 - side].get(n)
+                if other and newnode.cost + other.cost < best[0]:
+                    if side == 0:
+                        best = (newnode.cost + other.cost, newnode, other)
+                    else:
+                        best = (newnode.cost + other.cost, other, newnode)
+
+                if queued:
+                    # only add the cost if it is less than our bound
+                    predicted_cost = newnode.cost + self.cost_to_set(n, self.ends[1 - side])
+                    if predicted_cost < cost_bound:
+                        heappush(queues[side], (predicted_cost, self.counter, newnode))
+                        self.counter += 1
+
+        (cost, forward, backward) = best
+        if not forward:
+            return (None, None)
+
+        # The backward nodes point from the meeting grid to the target
+        path = forward.get_path()
+        node = backward.parent
+        while node:
+            path.append([node.point])
+            node = node.parent
+        return (path, cost)
+
+    def jump_node(self, node, side, nodes, cost_bound):
         """
-        Expand each of the four cardinal directions plus up or down
-        but not expanding to blocked cells. Expands in all directions
-        regardless of preferred directions.
+        Return the (node, queued) pairs of the new search nodes from a node
+        in each of the four cardinal directions plus up or down. A move in
+        the preferred direction of the layer keeps going towards the other
+        end over the open grids with the same blocked side grids as the grid
+        before them and only the last node of the jump is queued. A jump also stops on a line
+        through the other end or at a grid that was already reached.
         """
+        newnodes = []
+        for offset in self.offsets:
+            n = node.point + offset
+            if n.z>1 or n.z<0:
+                continue
+            if node.parent and n == node.parent.point:
+                continue
+            if self.is_blocked(n):
+                continue
+
+            # Only the preferred direction of the layer jumps
+            axis = 0 if offset.x else 1 if offset.y else 2
+            if axis != n.z:
+                newnodes.append((grid_node(n, node, node.cost + grid.step_cost(node.point, n)), True))
+                continue
+
+            stops = self.jump_stops[side][axis]
+            openings = self.side_openings(node.point, axis)
+            parent = node
+            predicted_cost = node.cost + grid.PREFERRED_COST + self.cost_to_set(n, self.ends[1 - side])
+            while True:
+                newnode = grid_node(n, parent, parent.cost + grid.PREFERRED_COST)
+                next_n = n + offset
+                next_cost = newnode.cost + grid.PREFERRED_COST
+                # Only jump towards the other end where the predicted cost stays the same
+                queued = (n[axis] in stops
+                          or self.is_blocked(next_n)
+                          or (next_n in nodes and nodes[next_n].cost <= next_cost)
+                          or next_cost + self.cost_to_set(next_n, self.ends[1 - side]) > predicted_cost
+                          or self.side_openings(n, axis) != openings)
+                newnodes.append((newnode, queued))
+                if queued:
+                    break
+                parent = newnode
+                n = next_n
 
-        # Expand all directions.
-        neighbors = curpath.expand_dirs()
+        return newnodes
 
-        # Filter the blocked ones
-        unblocked_neighbors = [x for x in neighbors if not self.is_blocked(x)]
+    def side_openings(self, point, axis):
+        """
+        Return whether the grids beside a grid across a move along the axis
+        and on the other layer are blocked.
+        """
+        if axis == 0:
+            side = vector3d(0, 1, 0)
+        else:
+            side = vector3d(1, 0, 0)
+        via = vector3d(point.x, point.y, 1 - point.z)
+        return (self.is_blocked(point + side), self.is_blocked(point - side), self.is_blocked(via))
+
+    def expand_node(self, node):
+        """
+        Expand a search node in each of the four cardinal directions plus up
+        or down but not to blocked cells or back to where it came from.
+        """
+        neighbors = []
+        for offset in self.offsets:
+            n = node.point + offset
+            if n.z>1 or n.z<0:
+                continue
+            if node.parent and n == node.parent.point:
+                continue
+            # This adds the node to the map as well
+            if self.is_blocked(n):
+                continue
+            neighbors.append(n)
 
-        return unblocked_neighbors
+        return neighbors
 
     def hpwl(self, src, dest):
         """
@@ -148,6 +319,13 @@ class signal_grid(grid):
 
         return cost
 
+    def cost_to_set(self, point, grids):
+        """
+        Find the cheapest HPWL distance to any of the grids ignoring
+        blockages for A* search.
+        """
+        return min(self.hpwl(point, t) for t in grids)
+
     def get_inertia(self, p0, p1):
         """
         Sets the direction based on the previous direction we came from.
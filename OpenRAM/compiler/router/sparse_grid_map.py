@@ -0,0 +1,76 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from vector3d import vector3d
+from grid_cell import grid_cell
+
+
+class sparse_grid_map(dict):
+    """
+    A map of vector3d grids to grid_cell objects that are created on demand
+    to keep the memory proportional to the grids that are actually used.
+    """
+
+    def add(self, n):
+        """
+        Add a grid to the map if it doesn't exist.
+        """
+        if n not in self:
+            self[n] = grid_cell()
+
+    def set_flag(self, n, flag, value=True):
+        self.add(n)
+        setattr(self[n], flag, value)
+
+    def get_flag(self, n, flag):
+        self.add(n)
+        return getattr(self[n], flag)
+
+    def set_flags(self, points, flag, value=True):
+        """
+        Set the flag on a collection of grids.
+        """
+        for n in points:
+            self.set_flag(n, flag, value)
+
+    def set_rect(self, ll, ur, flag, value=True):
+        """
+        Set the flag on all grids in the rectangle from ll to ur (inclusive)
+        on the layer of ll.
+        """
+        for x in range(ll.x, ur.x + 1):
+            for y in range(ll.y, ur.y + 1):
+                self.set_flag(vector3d(x, y, ll.z), flag, value)
+
+    def clear_flag(self, flag):
+        """
+        Clear the flag on all the grids.
+        """
+        for cell in self.values():
+            setattr(cell, flag, False)
+
+    def get_min_cost(self, n):
+        self.add(n)
+        return self[n].min_cost
+
+    def set_min_cost(self, n, cost):
+        self.add(n)
+        self[n].min_cost = cost
+
+    def clear_min_cost(self):
+        """
+        Reset only the search cost of all the grids.
+        """
+        for cell in self.values():
+            cell.min_cost = -1
+
+    def reset(self):
+        """
+        Reset the dynamic routing info of all the grids.
+        """
+        for cell in self.values():
+            cell.reset()
@@ -28,8 +28,7 @@ class supply_grid(signal_grid):
         self.target = set()
         
         # Reset all the cells in the map
-        for p in self.map.values():
-            p.reset()
+        self.map.reset()
 
     def find_start_wave(self, wave, direct):
         """
@@ -10,8 +10,10 @@ from globals import print_time
 from router import router
 from datetime import datetime
 import grid_utils
+import numpy as np
 from scipy.sparse import csr_matrix
 from scipy.sparse.csgraph import minimum_spanning_tree
+from scipy.spatial import cKDTree
 from signal_grid import signal_grid
 
 
@@ -20,6 +22,9 @@ class supply_tree_router(router):
     A router class to read an obstruction map from a gds and
     routes a grid to connect the supply on the two layers.
     """
+    # The number of nearest pin groups of each pin group that are
+    # candidate edges of the minimum spanning tree
+    MST_NEIGHBORS = 8
 
     def __init__(self, layers, design, bbox=None, pin_type=None):
         """
@@ -112,35 +117,12 @@ class supply_tree_router(router):
                 f.write("{0},{1},{2}\n".format(location.x, location.y, location.z))
             f.close()
 
-        # Create full graph
-        debug.info(2, "Creating adjacency matrix")
-        pin_size = len(self.pin_groups[pin_name])
-        adj_matrix = [[0] * pin_size for i in range(pin_size)]
-
-        for index1, pg1 in enumerate(self.pin_groups[pin_name]):
-            for index2, pg2 in enumerate(self.pin_groups[pin_name]):
-                if index1>=index2:
-                    continue
-                dist = int(grid_utils.distance_set(list(pg1.grids)[0], pg2.grids))
-                adj_matrix[index1][index2] = dist
-
         # Find MST
         debug.info(2, "Finding Minimum Spanning Tree")
-        X = csr_matrix(adj_matrix)
-        from scipy.sparse import save_npz
-        #print("Saving {}.npz".format(self.cell.name))
-        #save_npz("{}.npz".format(self.cell.name), X)
-        #exit(1)
-
-        Tcsr = minimum_spanning_tree(X)
-        mst = Tcsr.toarray().astype(int)
-        connections = []
-        for x in range(pin_size):
-            for y in range(pin_size):
-                if x >= y:
-                    continue
-                if mst[x][y]>0:
-                    connections.append((x, y))
+        connections = self.find_mst_connections(pin_name)
+
+        # Add all of the blockages once and only update the changes for each segment
+        self.prepare_segment_blockages()
 
         # Route MST components
         for index, (src, dest) in enumerate(connections):
@@ -155,37 +137,141 @@ class supply_tree_router(router):
         #self.write_debug_gds("final.gds", True)
         #return
 
+    def find_mst_connections(self, pin_name):
+        """
+        Return the (lower index, higher index) pin group pairs of a spanning
+        tree of the pin groups. Only the edges to the nearest pin groups are
+        candidates so this is sparse for large banks. The tree is therefore
+        approximate and may be heavier than the minimum spanning tree of all
+        of the pin group pairs.
+        """
+        pin_groups = self.pin_groups[pin_name]
+        pin_size = len(pin_groups)
+        # The distance is from a grid of the lower index pin group
+        # to the closest grid of the other pin group
+        locations = [next(iter(pg.grids)) for pg in pin_groups]
+
+        edges = self.find_candidate_edges(pin_name, locations, supply_tree_router.MST_NEIGHBORS)
+        weights = [int(grid_utils.distance_set(locations[x], pin_groups[y].grids)) for (x, y) in edges]
+        # Zero distances are not edges just like in a dense graph
+        edges = [(edge, weight) for (edge, weight) in zip(edges, weights) if weight > 0]
+        graph = csr_matrix(([weight for (edge, weight) in edges],
+                            ([x for ((x, y), weight) in edges], [y for ((x, y), weight) in edges])),
+                           shape=(pin_size, pin_size))
+
+        mst = minimum_spanning_tree(graph)
+        (rows, cols) = mst.nonzero()
+        return sorted(zip(rows.tolist(), cols.tolist()))
+
+    def find_candidate_edges(self, pin_name, locations, neighbors):
+        """
+        Return the sorted (lower index, higher index) pairs of each pin group
+        and the pin groups of any index that are nearest to its location.
+        Every pin group but the last also has an edge to its nearest higher
+        index pin group so the candidate graph is connected.
+        """
+        pin_groups = self.pin_groups[pin_name]
+        pin_size = len(pin_groups)
+        if neighbors >= pin_size - 1:
+            return [(x, y) for x in range(pin_size) for y in range(x + 1, pin_size)]
+
+        # All of the grids with the index of their pin group
+        grids = [(g.x, g.y) for pg in pin_groups for g in pg.grids]
+        grid_groups = np.repeat(np.arange(pin_size), [len(pg.grids) for pg in pin_groups])
+        tree = cKDTree(grids)
+
+        edges = set()
+        for (index, location) in enumerate(locations):
+            num_grids = neighbors + len(pin_groups[index].grids)
+            while True:
+                num_grids = min(num_grids, len(grids))
+                (unused, closest) = tree.query((location.x, location.y), k=num_grids)
+                # The closest grids in order of their pin groups
+                nearest = [x for x in dict.fromkeys(grid_groups[np.atleast_1d(closest)].tolist()) if x != index]
+                higher = [x for x in nearest if x > index]
+                if len(nearest) >= neighbors and (higher or index == pin_size - 1):
+                    break
+                if num_grids == len(grids):
+                    break
+                num_grids *= 2
+            edges.update((min(index, other), max(index, other)) for other in nearest[:neighbors])
+            if higher:
+                edges.add((index, higher[0]))
+
+        return sorted(edges)
+
+    def prepare_segment_blockages(self):
+        """
+        Reset the routing grid and add all of the blockages once before
+        routing the segments of a supply. route_signal only updates the
+        grids that change from one route to the next.
+        """
+        self.rg.reinit()
+        self.prepare_blockages()
+
+        # These are the grids that prepare_blockages blocks
+        self.segment_blockages = set(self.blocked_grids)
+        for name in self.pin_groups:
+            self.segment_blockages.update(y for x in self.pin_groups[name] for y in x.blockages)
+        for path in self.path_blockages:
+            self.segment_blockages.update(path)
+
+        # The blocked grids that were unblocked for the current route
+        self.unblocked_grids = set()
+
+    def restore_segment_blockages(self):
+        """
+        Block the grids that the last route unblocked and clear its search
+        so that the grid is as if prepare_blockages was just called.
+        """
+        self.set_blockages(self.unblocked_grids, True)
+        self.unblocked_grids = set()
+        self.rg.reinit_search()
+
+    def unblock_segment_grids(self, grids):
+        """
+        Unblock grids for the current route and remember the ones that
+        must be blocked again for the next route.
+        """
+        self.set_blockages(grids, False)
+        self.unblocked_grids.update(x for x in grids if x in self.segment_blockages)
+
     def route_signal(self, pin_name, src_idx, dest_idx):
 
         # First pass, try to route normally
         # Second pass, clear prior pin blockages so that you can route over other metal
         # of the same supply. Otherwise, this can create a lot of circular routes due to accidental overlaps.
         for unblock_routes in [False, True]:
-            for detour_scale in [5 * pow(2, x) for x in range(5)]:
+            for detour_scale in self.get_detour_scales():
                 debug.info(2, "Routing {0} to {1} with scale {2}".format(src_idx, dest_idx, detour_scale))
 
-                # Clear everything in the routing grid.
-                self.rg.reinit()
+                # Undo the changes of the last route instead of preparing
+                # all of the blockages again.
+                self.restore_segment_blockages()
 
-                # This is inefficient since it is non-incremental, but it was
-                # easier to debug.
-                self.prepare_blockages()
                 if unblock_routes:
                     msg = "Unblocking supply self blockages to improve access (may cause DRC errors):\n{0}\n{1})"
                     debug.warning(msg.format(pin_name,
                                              self.pin_groups[pin_name][src_idx].pins))
-                    self.set_blockages(self.path_blockages, False)
+                    self.unblock_segment_grids({y for x in self.path_blockages for y in x})
 
                 # Add the single component of the pin as the source
                 # which unmarks it as a blockage too
                 self.add_pin_component_source(pin_name, src_idx)
+                self.unblocked_grids.update(x for x in self.rg.source if x in self.segment_blockages)
 
                 # Marks all pin components except index as target
                 # which unmarks it as a blockage too
                 self.add_pin_component_target(pin_name, dest_idx)
+                self.unblocked_grids.update(x for x in self.rg.target if x in self.segment_blockages)
 
                 # Actually run the A* router
+                num_paths = len(self.path_blockages)
                 if self.run_router(detour_scale=detour_scale):
+                    # The new path is a blockage for the next routes
+                    for path in self.path_blockages[num_paths:]:
+                        self.set_blockages(path, True)
+                        self.segment_blockages.update(path)
                     return
 
         self.write_debug_gds("debug_route.gds", True)
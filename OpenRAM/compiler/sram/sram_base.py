@@ -233,6 +233,10 @@ class sram_base(design, verilog, lef):
 
         start_time = datetime.datetime.now()
         if not OPTS.is_unit_test:
+            # Report the scheduled checks of the modules first
+            if OPTS.check_lvsdrc:
+                import verify
+                verify.wait_drc_lvs()
             # We only enable final verification if we have routed the design
             # Only run this if not a unit test, because unit test will also verify it.
             self.DRC_LVS(final_verification=OPTS.route_supplies, force_check=OPTS.check_lvsdrc)
@@ -763,7 +767,7 @@ class sram_base(design, verilog, lef):
         # sp.write("* User: {0}\n".format(getpass.getuser()))
         # sp.write(".global {0} {1}\n".format(spice["vdd_name"],
         #                                     spice["gnd_name"]))
-        usedMODS = list()
+        usedMODS = set()
         self.sp_write_file(sp, usedMODS, lvs=lvs, trim=trim)
         del usedMODS
         sp.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import unittest
+from testutils import *
+import sys, os
+import random
+sys.path.append(os.getenv("OPENRAM_HOME"))
+import globals
+from globals import OPTS
+import debug
+
+
+class dense_grid_map_test(openram_test):
+    """
+    Apply the same operations to the dense and sparse grid maps
+    and check that every grid reads the same in both.
+    """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        globals.init_openram(config_file)
+        from vector3d import vector3d
+        from dense_grid_map import dense_grid_map
+        from sparse_grid_map import sparse_grid_map
+
+        random.seed(0)
+        halo = 2
+        ll = vector3d(-5, -3, 0)
+        ur = vector3d(10, 8, 0)
+        dense = dense_grid_map(ll, ur, halo)
+        sparse = sparse_grid_map()
+        flags = ["blocked", "path", "source", "target"]
+
+        # The grids in the bbox with the halo and a margin outside of it
+        # that is kept in the fallback map
+        margin = halo + 4
+        grids = [vector3d(x, y, z)
+                 for x in range(ll.x - margin, ur.x + margin + 1)
+                 for y in range(ll.y - margin, ur.y + margin + 1)
+                 for z in range(2)]
+
+        def random_rect():
+            x0 = random.randint(ll.x - margin, ur.x + margin)
+            y0 = random.randint(ll.y - margin, ur.y + margin)
+            z = random.randint(0, 1)
+            return (vector3d(x0, y0, z),
+                    vector3d(x0 + random.randint(0, 6), y0 + random.randint(0, 6), z))
+
+        for step in range(2000):
+            op = random.choice(["set_flag", "set_flags", "set_rect", "clear_flag",
+                                "set_min_cost", "clear_min_cost", "reset"])
+            flag = random.choice(flags)
+            value = random.random() < 0.7
+            if op == "set_flag":
+                n = random.choice(grids)
+                dense.set_flag(n, flag, value)
+                sparse.set_flag(n, flag, value)
+            elif op == "set_flags":
+                points = random.sample(grids, random.randint(0, 20))
+                dense.set_flags(points, flag, value)
+                sparse.set_flags(points, flag, value)
+            elif op == "set_rect":
+                (rect_ll, rect_ur) = random_rect()
+                dense.set_rect(rect_ll, rect_ur, flag, value)
+                sparse.set_rect(rect_ll, rect_ur, flag, value)
+            elif op == "set_min_cost":
+                n = random.choice(grids)
+                cost = random.randint(0, 100)
+                dense.set_min_cost(n, cost)
+                sparse.set_min_cost(n, cost)
+            # The clears and resets are less frequent so that the maps fill up
+            elif random.random() < 0.05:
+                if op == "clear_flag":
+                    dense.clear_flag(flag)
+                    sparse.clear_flag(flag)
+                elif op == "clear_min_cost":
+                    dense.clear_min_cost()
+                    sparse.clear_min_cost()
+                else:
+                    dense.reset()
+                    sparse.reset()
+
+            if step % 200 == 0:
+                self.compare_maps(dense, sparse, grids, flags)
+        self.compare_maps(dense, sparse, grids, flags)
+
+        # Grids outside of the arrays must be in the fallback map
+        outside = vector3d(ur.x + halo + 1, ur.y, 0)
+        self.assertIsNone(dense.index(outside))
+        dense.set_flag(outside, "blocked", True)
+        self.assertIn(outside, dense.fallback)
+        self.assertTrue(dense.get_flag(outside, "blocked"))
+
+        globals.end_openram()
+
+    def compare_maps(self, dense, sparse, grids, flags):
+        # The dense map iterates the grids with any information in them
+        used = set(n for n, cell in sparse.items()
+                   if cell.min_cost != -1 or any(getattr(cell, flag) for flag in flags))
+        self.assertEqual(set(n for n in dense if dense.get_min_cost(n) != -1
+                             or any(dense.get_flag(n, flag) for flag in flags)),
+                         used)
+        for n in grids:
+            for flag in flags:
+                self.assertEqual(dense.get_flag(n, flag), sparse.get_flag(n, flag),
+                                 "{0} {1}".format(n, flag))
+            self.assertEqual(dense.get_min_cost(n), sparse.get_min_cost(n), str(n))
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import unittest
+from testutils import *
+import sys, os
+sys.path.append(os.getenv("OPENRAM_HOME"))
+import globals
+from globals import OPTS
+import debug
+
+
+class gds_aref_test(openram_test):
+    """
+    Write a GDS with arrays of references (AREF), read it back and
+    check the array parameters, the flattened placements and the shapes.
+    """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        globals.init_openram(config_file)
+        import gdsMill
+        from gdsMill.gdsPrimitives import GdsStructure, GdsBoundary, GdsAref
+
+        units = (0.001, 1e-9)
+        layout = gdsMill.VlsiLayout(name="root", units=units)
+        root = layout.structures["root"]
+
+        cell = GdsStructure()
+        cell.name = "cell"
+        cell.createDate = root.createDate
+        cell.modDate = root.modDate
+        box = GdsBoundary()
+        box.drawingLayer = 1
+        box.purposeLayer = 0
+        box.coordinates = [(0, 0), (0, 10), (20, 10), (20, 0), (0, 0)]
+        cell.boundaries.append(box)
+        layout.structures["cell"] = cell
+
+        # 3 columns with a 30 pitch and 2 rows with a 50 pitch
+        plain = GdsAref()
+        plain.aName = "cell"
+        plain.colRow = (3, 2)
+        plain.coordinates = [(100, 200), (190, 200), (100, 300)]
+        root.arefs.append(plain)
+        # 2x2 array of cells rotated by 90 degrees
+        rotated = GdsAref()
+        rotated.aName = "cell"
+        rotated.rotateAngle = 90.0
+        rotated.colRow = (2, 2)
+        rotated.coordinates = [(1000, 0), (1080, 0), (1000, 120)]
+        root.arefs.append(rotated)
+
+        gds_file = "{}aref.gds".format(OPTS.openram_temp)
+        gdsMill.Gds2writer(layout).writeToFile(gds_file)
+
+        new_layout = gdsMill.VlsiLayout(units=units)
+        gdsMill.Gds2reader(new_layout).loadFromFile(gds_file)
+        self.assertEqual(new_layout.rootStructureName, "root")
+
+        arefs = new_layout.structures["root"].arefs
+        self.assertEqual([(a.aName, tuple(a.colRow)) for a in arefs],
+                         [("cell", (3, 2)), ("cell", (2, 2))])
+        self.assertEqual([[tuple(c) for c in a.coordinates] for a in arefs],
+                         [plain.coordinates, rotated.coordinates])
+        self.assertEqual(arefs[1].rotateAngle, 90.0)
+
+        # The placements of the array elements in the flattened hierarchy
+        expected_placements = []
+        for row in range(2):
+            for col in range(3):
+                expected_placements.append((100 + 30 * col, 200 + 50 * row, (1, 0), (0, 1)))
+        for row in range(2):
+            for col in range(2):
+                expected_placements.append((1000 + 40 * col, 60 * row, (0, 1), (-1, 0)))
+        placements = []
+        for (name, origin, u, v) in new_layout.xyTree:
+            if name == "cell":
+                placements.append((round(origin[0][0]), round(origin[1][0]),
+                                   (round(u[0][0]), round(u[1][0])),
+                                   (round(v[0][0]), round(v[1][0]))))
+        self.assertEqual(sorted(placements), sorted(expected_placements))
+
+        # The box in every placement
+        expected_shapes = []
+        for (x, y, u, v) in expected_placements:
+            if u == (1, 0):
+                expected_shapes.append([(x, y, x + 20, y + 10)])
+            else:
+                expected_shapes.append([(x - 10, y, x, y + 20)])
+        shapes = [[tuple(round(c) for c in shape) for shape in placement]
+                  for placement in new_layout.getShapesInStructure((1, 0), "cell")]
+        self.assertEqual(sorted(shapes), sorted(expected_shapes))
+
+        # Writing the layout that was read gives the same file
+        rewritten_file = "{}aref_rewritten.gds".format(OPTS.openram_temp)
+        gdsMill.Gds2writer(new_layout).writeToFile(rewritten_file)
+        with open(gds_file, "rb") as f1, open(rewritten_file, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+        globals.end_openram()
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import unittest
+from testutils import *
+import sys, os
+import time
+sys.path.append(os.getenv("OPENRAM_HOME"))
+import globals
+from globals import OPTS
+import debug
+
+
+def stub_run_drc_lvs(cell_name, gds_name, sp_name, extract=True, final_verification=False):
+    """ Return the errors in the name of a cell instead of running the tools. """
+    import verify
+    sys.modules[verify.run_drc.__module__].num_drc_runs += 1
+    sys.modules[verify.run_lvs.__module__].num_lvs_runs += 1
+    if cell_name.startswith("crash"):
+        debug.error("{} crashed".format(cell_name), -1)
+    if cell_name.startswith("drc"):
+        return (1, 0)
+    if cell_name.startswith("lvs"):
+        return (0, 2)
+    return (0, 0)
+
+
+class job_scheduler_test(openram_test):
+    """
+    Schedule DRC/LVS jobs with a stub of the tools and check when the
+    failures are reported and that the tool runs of the workers are counted.
+    """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        globals.init_openram(config_file)
+        import verify
+        from verify import job_scheduler
+
+        OPTS.num_threads = 2
+        verify.run_drc_lvs = stub_run_drc_lvs
+        drc_module = sys.modules[verify.run_drc.__module__]
+        lvs_module = sys.modules[verify.run_lvs.__module__]
+        drc_module.num_drc_runs = 0
+        lvs_module.num_lvs_runs = 0
+
+        # Passing checks are not reported
+        OPTS.inline_lvsdrc_fail_fast = False
+        for i in range(4):
+            self.schedule("good{}".format(i))
+        verify.wait_drc_lvs()
+        self.assertEqual(job_scheduler.jobs, [])
+        self.assertEqual((drc_module.num_drc_runs, lvs_module.num_lvs_runs), (4, 4))
+
+        # Without fail fast the failures are only reported when waiting
+        for name in ["good", "drc", "lvs", "crash", "good"]:
+            self.schedule(name)
+            self.wait_for_jobs()
+        with self.assertRaises(AssertionError):
+            verify.wait_drc_lvs()
+        self.assertEqual(job_scheduler.jobs, [])
+        self.assertEqual((drc_module.num_drc_runs, lvs_module.num_lvs_runs), (9, 9))
+        verify.wait_drc_lvs()
+
+        # With fail fast the failure is reported by the next scheduled check
+        OPTS.inline_lvsdrc_fail_fast = True
+        self.schedule("drc")
+        self.wait_for_jobs()
+        with self.assertRaises(AssertionError):
+            self.schedule("good")
+        verify.wait_drc_lvs()
+        self.assertEqual((drc_module.num_drc_runs, lvs_module.num_lvs_runs), (11, 11))
+
+        globals.end_openram()
+
+    def schedule(self, cell_name):
+        import verify
+        verify.schedule_drc_lvs(cell_name, OPTS.openram_temp, "{}.gds".format(cell_name), "{}.sp".format(cell_name))
+
+    def wait_for_jobs(self):
+        from verify import job_scheduler
+        while not all(result.ready() for (cell_name, result) in job_scheduler.jobs):
+            time.sleep(0.01)
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import unittest
+from testutils import *
+import sys, os
+sys.path.append(os.getenv("OPENRAM_HOME"))
+import globals
+from globals import OPTS
+import debug
+
+
+class library_gds_cache_test(openram_test):
+    """
+    Load a library cell twice, change one of the copies and check that
+    the cached layout and the other copy do not change. Then load the
+    cell from the pickled cache and check that it has the same shapes and pins.
+    """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        globals.init_openram(config_file)
+        OPTS.gds_cache_path = OPTS.openram_temp + "gds_cache"
+        import gdsMill
+        from tech import layer
+        from hierarchy_layout import layout
+
+        lpp = layer["m1"]
+        layout.gds_cache.clear()
+        first = layout("dff", "dff")
+        second = layout("dff", "dff")
+        self.assertEqual(len(layout.gds_cache), 1)
+        cached = list(layout.gds_cache.values())[0]
+        self.assertIsNot(first.gds, cached)
+        self.assertIsNot(second.gds, cached)
+        original = self.get_shapes_and_pins(cached, lpp)
+        self.assertTrue(original[0])
+        self.assertTrue(original[1])
+        self.assertEqual(self.get_shapes_and_pins(first.gds, lpp), original)
+
+        # Add a box and pins to one of the copies
+        first.gds.addBox(layerNumber=lpp[0], purposeNumber=lpp[1], offsetInMicrons=(100, 100), width=1, height=1)
+        pin_name = sorted(first.gds.pins)[0]
+        first.gds.pins[pin_name][0].append((lpp, [100, 100, 101, 101]))
+        first.gds.pins["new_pin"] = [[(lpp, [100, 100, 101, 101])]]
+        changed = self.get_shapes_and_pins(first.gds, lpp)
+        self.assertEqual(len(changed[0]), len(original[0]) + 1)
+        self.assertNotEqual(changed[1], original[1])
+
+        self.assertEqual(self.get_shapes_and_pins(cached, lpp), original)
+        self.assertEqual(self.get_shapes_and_pins(second.gds, lpp), original)
+
+        # The pickled layout is loaded without parsing the GDS again
+        self.assertEqual(len(os.listdir(OPTS.gds_cache_path)), 1)
+        layout.gds_cache.clear()
+        load_from_file = gdsMill.Gds2reader.loadFromFile
+        gdsMill.Gds2reader.loadFromFile = lambda *args: self.fail("The cached GDS was parsed again")
+        try:
+            third = layout("dff", "dff")
+        finally:
+            gdsMill.Gds2reader.loadFromFile = load_from_file
+        self.assertEqual(self.get_shapes_and_pins(third.gds, lpp), original)
+
+        # The pickles of another version are not loaded
+        layout.gds_cache.clear()
+        gdsMill.PICKLE_VERSION += 1
+        try:
+            fourth = layout("dff", "dff")
+        finally:
+            gdsMill.PICKLE_VERSION -= 1
+        self.assertEqual(len(os.listdir(OPTS.gds_cache_path)), 2)
+        self.assertEqual(self.get_shapes_and_pins(fourth.gds, lpp), original)
+
+        globals.end_openram()
+
+    def get_shapes_and_pins(self, gds, lpp):
+        """ Return the shapes on a layer and the pins of a layout in a comparable form. """
+        shapes = sorted(tuple(shape) for shape in gds.getAllShapes(lpp))
+        pins = {label: [[(pin_lpp, tuple(boundary)) for (pin_lpp, boundary) in pin_list] for pin_list in pin_map]
+                for label, pin_map in gds.pins.items()}
+        return (shapes, pins)
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
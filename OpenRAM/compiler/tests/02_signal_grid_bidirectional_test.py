@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import unittest
+from testutils import *
+import sys, os
+import random
+sys.path.append(os.getenv("OPENRAM_HOME"))
+import globals
+from globals import OPTS
+import debug
+
+
+class signal_grid_bidirectional_test(openram_test):
+    """
+    Route random two layer grids with blockages with both maze searches.
+    The bidirectional search must find a valid path whenever route does.
+    Its jumps may return a costlier path so the costs are not compared.
+    """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        globals.init_openram(config_file)
+        from vector import vector
+        from vector3d import vector3d
+        from signal_grid import signal_grid
+        from grid import grid
+
+        random.seed(0)
+        size = 16
+        for trial in range(300):
+            density = random.choice([0.1, 0.2, 0.3, 0.4])
+            # A blocked ring keeps the searches inside of the grid
+            blocked = set()
+            for x in range(-1, size + 1):
+                for y in range(-1, size + 1):
+                    for z in range(2):
+                        inside = 0 <= x < size and 0 <= y < size
+                        if not inside or random.random() < density:
+                            blocked.add(vector3d(x, y, z))
+            grids = [vector3d(x, y, z) for x in range(size) for y in range(size) for z in range(2)]
+            (source, target) = random.sample(grids, 2)
+            # The source and target are never blocked
+            blocked -= set([source, target])
+
+            results = []
+            for search in ["route", "route_bidirectional"]:
+                rg = signal_grid(vector(0, 0), vector(size, size), 1)
+                rg.set_blocked(blocked)
+                rg.set_source([source])
+                rg.set_target([target])
+                (path, cost) = getattr(rg, search)(100)
+                if path:
+                    self.check_path(rg, grid, path, cost, source, target, blocked)
+                results.append(path is not None)
+
+            self.assertEqual(results[0], results[1],
+                             "trial {0}: {1} to {2}".format(trial, source, target))
+
+        globals.end_openram()
+
+    def check_path(self, rg, grid, path, cost, source, target, blocked):
+        points = [x[0] for x in path.pathlist]
+        self.assertEqual(points[0], source)
+        self.assertEqual(points[-1], target)
+        path_cost = 0
+        for (p0, p1) in zip(points, points[1:]):
+            # Every step is to an adjacent grid that is not blocked
+            self.assertEqual(abs(p0.x - p1.x) + abs(p0.y - p1.y) + abs(p0.z - p1.z), 1)
+            self.assertFalse(p1 in blocked, "{} is blocked".format(p1))
+            path_cost += grid.step_cost(p0, p1)
+        self.assertEqual(cost, path_cost)
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
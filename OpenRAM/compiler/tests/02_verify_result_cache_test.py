@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import unittest
+from testutils import *
+import sys, os
+import json
+sys.path.append(os.getenv("OPENRAM_HOME"))
+import globals
+from globals import OPTS
+import debug
+
+
+class verify_result_cache_test(openram_test):
+    """
+    Check the DRC/LVS result cache with stubs of the tools. Only a change
+    of the shapes or the netlist runs a check again and the netlist that
+    magic extracts for netgen is never taken from a cached DRC.
+    """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        globals.init_openram(config_file)
+        import verify
+
+        self.runs = []
+        verify.run_drc = self.stub_run_drc
+        verify.run_lvs = self.stub_run_lvs
+        # Any file can be the tool since only its size and date are hashed
+        tool = os.path.realpath(__file__)
+        OPTS.drc_exe = ("klayout", tool)
+        OPTS.lvs_exe = ("klayout", tool)
+        OPTS.verify_cache = OPTS.openram_temp + "verify_cache/"
+
+        # Rewriting the same layout only changes its dates
+        self.write_gds(2000, 1)
+        with open(OPTS.openram_temp + "cell.gds", "rb") as f:
+            first_gds = f.read()
+        self.write_sp(["M1 d g s b nmos\n"])
+        self.assertEqual(verify.cached_drc("cell", "cell.gds", "cell.sp", extract=True), 0)
+        self.assertEqual(verify.cached_lvs("cell", "cell.gds", "cell.sp"), 0)
+        self.assertEqual(self.runs, [("drc", True), ("lvs",)])
+
+        self.write_gds(2001, 1)
+        with open(OPTS.openram_temp + "cell.gds", "rb") as f:
+            self.assertNotEqual(f.read(), first_gds)
+        self.write_sp(["M1 d g s b nmos\n"])
+        verify.cached_drc("cell", "cell.gds", "cell.sp", extract=True)
+        verify.cached_lvs("cell", "cell.gds", "cell.sp")
+        self.assertEqual(len(self.runs), 2)
+
+        # A changed shape or netlist line is checked again
+        self.write_gds(2001, 2)
+        verify.cached_drc("cell", "cell.gds", "cell.sp", extract=True)
+        self.assertEqual(self.runs[2:], [("drc", True)])
+        self.write_sp(["M1 d g s b pmos\n"])
+        verify.cached_lvs("cell", "cell.gds", "cell.sp")
+        self.assertEqual(self.runs[3:], [("lvs",)])
+
+        # Magic and netgen store DRC and LVS in one entry
+        OPTS.drc_exe = ("magic", tool)
+        OPTS.lvs_exe = ("netgen", tool)
+        OPTS.verify_cache = OPTS.openram_temp + "magic_cache/"
+        self.runs = []
+        self.assertEqual(verify.run_drc_lvs("cell", "cell.gds", "cell.sp"), (0, 0))
+        self.assertEqual(self.runs, [("drc", True), ("lvs",)])
+        entries = os.listdir(OPTS.verify_cache)
+        self.assertEqual(len(entries), 1)
+        with open(OPTS.verify_cache + entries[0], "r") as f:
+            self.assertEqual(json.load(f)["check"], "drc_lvs")
+        self.assertEqual(verify.run_drc_lvs("cell", "cell.gds", "cell.sp"), (0, 0))
+        self.assertEqual(len(self.runs), 2)
+
+        # An LVS miss extracts the netlist again after a cached DRC
+        self.runs = []
+        verify.cached_drc("cell", "cell.gds", "cell.sp", extract=True)
+        verify.cached_drc("cell", "cell.gds", "cell.sp", extract=True)
+        self.assertEqual(self.runs, [("drc", True)])
+        verify.cached_lvs("cell", "cell.gds", "cell.sp")
+        self.assertEqual(self.runs[1:], [("drc", True), ("lvs",)])
+
+        globals.end_openram()
+
+    def stub_run_drc(self, cell_name, gds_name, sp_name, extract=False, final_verification=False):
+        self.runs.append(("drc", extract))
+        return 0
+
+    def stub_run_lvs(self, cell_name, gds_name, sp_name, final_verification=False):
+        self.runs.append(("lvs",))
+        return 0
+
+    def write_gds(self, year, width):
+        """ Write a layout with a box in the temp directory dated in the year. """
+        import gdsMill
+        from tech import GDS
+        gds = gdsMill.VlsiLayout(name="cell", units=GDS["unit"])
+        date = (year, 1, 1, 0, 0, 0)
+        gds.structures["cell"].createDate = date
+        gds.structures["cell"].modDate = date
+        gds.info["dates"] = date + date
+        gds.addBox(layerNumber=1, purposeNumber=0, width=width, height=1)
+        gdsMill.Gds2writer(gds).writeToFile(OPTS.openram_temp + "cell.gds")
+
+    def write_sp(self, lines):
+        with open(OPTS.openram_temp + "cell.sp", "w") as f:
+            f.write(".SUBCKT cell d g s b\n")
+            f.writelines(lines)
+            f.write(".ENDS cell\n")
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import unittest
+from testutils import *
+import sys, os
+import random
+sys.path.append(os.getenv("OPENRAM_HOME"))
+import globals
+from globals import OPTS
+import debug
+
+
+class timing_graph_test(openram_test):
+    """
+    Compare the paths of random graphs with cycles and vdd/gnd nodes
+    to a brute force enumeration and check that changing the graph
+    clears the cached paths.
+    """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        globals.init_openram(config_file)
+        from timing_graph import timing_graph
+
+        random.seed(0)
+        nodes = ["n{}".format(x) for x in range(7)] + ["vdd", "gnd"]
+        for trial in range(200):
+            num_edges = random.randint(5, 25)
+            edges = set((random.choice(nodes), random.choice(nodes)) for x in range(num_edges))
+            edges = [(src, dest) for (src, dest) in edges if src != dest]
+            (src, dest) = random.sample(nodes[:7], 2)
+
+            for remove_rail_nodes in [True, False]:
+                for reduce_paths in [True, False]:
+                    graph = timing_graph()
+                    for (x, y) in edges:
+                        graph.add_edge(x, y, None)
+                    paths = graph.get_all_paths(src, dest, remove_rail_nodes, reduce_paths)
+                    expected = self.brute_force_paths(edges, src, dest, remove_rail_nodes, reduce_paths)
+                    self.assertEqual(sorted(paths), sorted(expected),
+                                     "trial {0} {1} {2}".format(trial, remove_rail_nodes, reduce_paths))
+
+        # A path from a node to itself
+        graph = timing_graph()
+        graph.add_edge("a", "b", None)
+        self.assertEqual(graph.get_all_paths("a", "a"), [["a"]])
+
+        # The cached paths can't be changed through the returned ones
+        graph = timing_graph()
+        graph.add_edge("A", "B", None)
+        graph.add_edge("B", "C", None)
+        paths = graph.get_all_paths("a", "c")
+        self.assertEqual(paths, [["a", "b", "c"]])
+        paths[0].append("d")
+        self.assertEqual(graph.get_all_paths("a", "c"), [["a", "b", "c"]])
+        self.assertTrue(graph.path_cache)
+
+        # A new edge clears the cache and adds its paths
+        graph.add_edge("a", "c", None)
+        self.assertEqual(graph.path_cache, {})
+        self.assertEqual(sorted(graph.get_all_paths("a", "c", reduce_paths=False)),
+                         [["a", "b", "c"], ["a", "c"]])
+
+        # Removing the edges of a node clears the cache and its paths
+        self.assertTrue(graph.path_cache)
+        graph.remove_edges("b")
+        self.assertEqual(graph.path_cache, {})
+        self.assertEqual(graph.get_all_paths("a", "c"), [["a", "c"]])
+
+        # Removing a node without edges keeps the cache
+        graph.remove_edges("c")
+        self.assertTrue(graph.path_cache)
+
+        globals.end_openram()
+
+    def brute_force_paths(self, edges, src, dest, remove_rail_nodes, reduce_paths):
+        """ All of the simple paths from src to dest found with a recursive search. """
+        graph = {}
+        for (x, y) in edges:
+            if remove_rail_nodes and x in ["vdd", "gnd"]:
+                continue
+            graph.setdefault(x, []).append(y)
+
+        paths = []
+
+        def search(path):
+            if path[-1] == dest:
+                paths.append(list(path))
+                return
+            for node in graph.get(path[-1], []):
+                if node not in path:
+                    search(path + [node])
+        search([src])
+
+        if reduce_paths:
+            paths = [p1 for (i, p1) in enumerate(paths)
+                     if not any(set(p1) <= set(p2) for (j, p2) in enumerate(paths) if i != j)]
+        return paths
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import unittest
+from testutils import *
+import sys, os
+sys.path.append(os.getenv("OPENRAM_HOME"))
+import globals
+from globals import OPTS
+import debug
+
+
+class lib_sram_model_store_test(openram_test):
+    """
+    Save the regression models to the model store, load them into
+    an empty store and check that the predictions are the same.
+    """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        globals.init_openram(config_file)
+        OPTS.netlist_only = True
+        OPTS.model_name = "linear_regression"
+        OPTS.model_store_path = OPTS.openram_temp + "model_store"
+
+        import tech
+        from characterizer import lib
+        from characterizer.linear_regression import linear_regression
+        from characterizer.regression_model import model_store
+        from sram import sram
+        from sram_config import sram_config
+        c = sram_config(word_size=2,
+                        num_words=16,
+                        num_banks=1)
+        c.words_per_row=1
+        c.recompute_sizes()
+        debug.info(1, "Testing the model store for sample 2 bit, 16 words SRAM with 1 bank")
+
+        s = sram(c, "sram_2_16_1_{0}".format(OPTS.tech_name))
+        tempspice = OPTS.openram_temp + "temp.sp"
+        s.sp_write(tempspice)
+
+        corner = ("TT", tech.spice["nom_supply_voltage"], tech.spice["nom_temperature"])
+        load_slews = [(load, slew) for load in [0.01, 0.1] for slew in [0.02, 0.2]]
+
+        model_store.clear()
+        trained = linear_regression(s.s, tempspice, corner).get_lib_values(load_slews)
+        self.assertEqual(len(os.listdir(OPTS.model_store_path)), 1)
+
+        # The models must be loaded from the file instead of trained again
+        model_store.clear()
+        m = linear_regression(s.s, tempspice, corner)
+        m.train_models = lambda: self.fail("The stored models were trained again")
+        loaded = m.get_lib_values(load_slews)
+        self.assertEqual(len(model_store), 1)
+        self.assertEqual(loaded, trained)
+
+        # The corners share the models that are trained once
+        OPTS.model_store_path = None
+        OPTS.nominal_corner_only = False
+        OPTS.num_threads = 3
+        model_store.clear()
+        train_models = linear_regression.train_models
+        trained_pids = []
+
+        def count_train_models(model):
+            trained_pids.append(os.getpid())
+            return train_models(model)
+        linear_regression.train_models = count_train_models
+        try:
+            corner_lib = lib(out_dir=OPTS.openram_temp, sram=s.s, sp_file=tempspice, use_model=True)
+        finally:
+            linear_regression.train_models = train_models
+        self.assertGreater(len(corner_lib.corners), 1)
+        self.assertEqual(trained_pids, [os.getpid()])
+
+        globals.end_openram()
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
@@ -15,7 +15,10 @@ run_pex, repsectively. If there is an error, they should abort and report the er
 If not, OpenRAM will continue as if nothing happened!
 """
 
+import concurrent.futures
 import debug
+from . import result_cache
+from .job_scheduler import schedule_drc_lvs, wait_drc_lvs
 from globals import OPTS
 from globals import get_tool
 from tech import drc_name
@@ -79,6 +82,67 @@ else:
     debug.warning("Did not find a supported PEX tool."
                   + "Disable DRC/LVS with check_lvsdrc=False to ignore.", 2)
 
+
+
+def run_drc_lvs(cell_name, gds_name, sp_name, extract=True, final_verification=False):
+    """
+    Run DRC and LVS on a cell and return the number of (DRC, LVS) errors.
+    They are independent so LVS runs in another thread while DRC runs.
+    Magic and netgen run one after the other since netgen compares the
+    netlist that magic extracts during DRC. Assura also runs one after
+    the other since its DRC and LVS share the same run script.
+    """
+    if extracts_lvs_netlist():
+        # The LVS result is only valid with the extraction of the same DRC run
+        # so both are stored in one cache entry
+        return tuple(result_cache.run_check("drc_lvs", run_drc_then_lvs, cell_name, gds_name, sp_name,
+                                            extract=extract, final_verification=final_verification))
+
+    if OPTS.drc_exe and OPTS.drc_exe[0] == "assura":
+        drc_errors = cached_drc(cell_name, gds_name, sp_name, extract=extract, final_verification=final_verification)
+        lvs_errors = cached_lvs(cell_name, gds_name, sp_name, final_verification=final_verification)
+        return (drc_errors, lvs_errors)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        lvs_future = executor.submit(cached_lvs, cell_name, gds_name, sp_name, final_verification=final_verification)
+        drc_errors = cached_drc(cell_name, gds_name, sp_name, extract=extract, final_verification=final_verification)
+        # This raises any error of the LVS thread
+        lvs_errors = lvs_future.result()
+    return (drc_errors, lvs_errors)
+
+
+def extracts_lvs_netlist():
+    """ Netgen compares the netlist that magic extracts during DRC. """
+    return OPTS.drc_exe and OPTS.drc_exe[0] == "magic" and OPTS.lvs_exe and OPTS.lvs_exe[0] == "netgen"
+
+
+def run_drc_then_lvs(cell_name, gds_name, sp_name, extract=True, final_verification=False):
+    """ Run DRC and then LVS on a cell and return the number of (DRC, LVS) errors. """
+    drc_errors = run_drc(cell_name, gds_name, sp_name, extract=extract, final_verification=final_verification)
+    lvs_errors = run_lvs(cell_name, gds_name, sp_name, final_verification=final_verification)
+    return (drc_errors, lvs_errors)
+
+
+def run_extracted_lvs(cell_name, gds_name, sp_name, final_verification=False):
+    """
+    Extract the netlist with a DRC run and then run LVS on it since
+    a cached DRC result does not leave an extracted netlist.
+    """
+    return run_drc_then_lvs(cell_name, gds_name, sp_name, extract=True, final_verification=final_verification)[1]
+
+
+def cached_drc(cell_name, gds_name, sp_name, **options):
+    """ Run DRC on a cell unless the result is in the result cache. """
+    return result_cache.run_check("drc", run_drc, cell_name, gds_name, sp_name, **options)
+
+
+def cached_lvs(cell_name, gds_name, sp_name, **options):
+    """ Run LVS on a cell unless the result is in the result cache. """
+    if OPTS.verify_cache and extracts_lvs_netlist():
+        return result_cache.run_check("lvs", run_extracted_lvs, cell_name, gds_name, sp_name, **options)
+    return result_cache.run_check("lvs", run_lvs, cell_name, gds_name, sp_name, **options)
+
+
 # if OPTS.tech_name == "sky130":
 #     if OPTS.magic_exe and "magic"==OPTS.magic_exe[0]:
 #         from .magic import filter_gds
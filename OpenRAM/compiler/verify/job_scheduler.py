@@ -0,0 +1,115 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+Runs the inline DRC/LVS of the modules in a pool of worker processes
+so that the layout generation does not wait for every check.
+The failures are reported when the checks are waited for or as soon
+as they finish with inline_lvsdrc_fail_fast.
+"""
+
+import sys
+import multiprocessing
+import debug
+from globals import OPTS
+
+# The worker processes of the scheduled checks
+parallel_verify = None
+# The (cell name, result) of the scheduled checks that were not reported yet
+jobs = []
+
+
+def verify_worker(args):
+    """
+    Process pool entry to run the DRC and LVS of a cell in its own directory.
+    Returns the errors and the number of tool runs since the run counters of
+    a worker are not seen by the parent process.
+    """
+    (cell_name, temp_path, gds_name, sp_name) = args
+    import verify
+    # The tools use the same script names so every cell is checked in its own directory
+    OPTS.openram_temp = temp_path
+    (drc_runs, lvs_runs) = get_run_counts()
+    try:
+        errors = verify.run_drc_lvs(cell_name, gds_name, sp_name, extract=True)
+    except AssertionError:
+        # The tool already printed why it failed
+        errors = None
+    (new_drc_runs, new_lvs_runs) = get_run_counts()
+    return (errors, (new_drc_runs - drc_runs, new_lvs_runs - lvs_runs))
+
+
+def get_run_counts():
+    """ Return the number of (DRC, LVS) runs of the tool modules. """
+    import verify
+    drc_module = sys.modules[verify.run_drc.__module__]
+    lvs_module = sys.modules[verify.run_lvs.__module__]
+    return (getattr(drc_module, "num_drc_runs", 0), getattr(lvs_module, "num_lvs_runs", 0))
+
+
+def add_run_counts(drc_runs, lvs_runs):
+    """ Add the tool runs of a worker to the run counters of this process. """
+    import verify
+    drc_module = sys.modules[verify.run_drc.__module__]
+    lvs_module = sys.modules[verify.run_lvs.__module__]
+    if hasattr(drc_module, "num_drc_runs"):
+        drc_module.num_drc_runs += drc_runs
+    if hasattr(lvs_module, "num_lvs_runs"):
+        lvs_module.num_lvs_runs += lvs_runs
+
+
+def schedule_drc_lvs(cell_name, temp_path, gds_name, sp_name):
+    """ Schedule the DRC and LVS of a cell whose GDS and netlist are in temp_path. """
+    global parallel_verify
+
+    if not parallel_verify:
+        parallel_verify = multiprocessing.get_context("fork").Pool(processes=OPTS.num_threads)
+    debug.info(2, "Scheduling DRC/LVS of {}".format(cell_name))
+    result = parallel_verify.apply_async(verify_worker, ((cell_name, temp_path, gds_name, sp_name),))
+    jobs.append((cell_name, result))
+
+    if OPTS.inline_lvsdrc_fail_fast:
+        check_drc_lvs(wait=False)
+
+
+def wait_drc_lvs():
+    """ Wait for all of the scheduled checks and report the ones that failed. """
+    global parallel_verify
+
+    if not parallel_verify:
+        return
+    check_drc_lvs(wait=True)
+    parallel_verify.close()
+    parallel_verify.join()
+    parallel_verify = None
+
+
+def check_drc_lvs(wait=True):
+    """
+    Report the scheduled checks that failed. Without wait, only the
+    checks that already finished are reported.
+    """
+    global jobs
+
+    failures = []
+    remaining = []
+    for (cell_name, result) in jobs:
+        if not wait and not result.ready():
+            remaining.append((cell_name, result))
+            continue
+        (errors, runs) = result.get()
+        add_run_counts(*runs)
+        if errors is None:
+            failures.append("{} did not finish".format(cell_name))
+        elif errors != (0, 0):
+            failures.append("{0} with {1} DRC and {2} LVS error(s)".format(cell_name, *errors))
+    jobs = remaining
+
+    for failure in failures:
+        debug.warning("DRC/LVS failed for {}".format(failure))
+    debug.check(len(failures) == 0,
+                "DRC/LVS failed for {} module(s)".format(len(failures)))
@@ -0,0 +1,127 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+An on-disk cache of DRC and LVS results. A result is stored by a hash
+of the GDS, the netlist, the technology and the tool so that checking
+a cell that has not changed returns the stored errors without running
+the tool.
+"""
+
+import os
+import json
+import hashlib
+import debug
+from globals import OPTS
+from utils import write_atomic
+
+# GDS record types with the dates that change every time a GDS is written
+GDS_DATE_RECORDS = [0x01, 0x05]  # BGNLIB, BGNSTR
+
+# The hash of the technology and tools for each (tech, DRC, LVS, rule decks, netgen setup)
+tool_hashes = {}
+
+
+def hash_gds(h, gds_name):
+    """ Add the records of a GDS without the dates to the hash. """
+    with open(gds_name, "rb") as f:
+        data = f.read()
+    index = 0
+    while index + 4 <= len(data):
+        size = int.from_bytes(data[index:index + 2], "big")
+        # The file may be padded with zeros after the library
+        if size < 4:
+            break
+        if data[index + 2] in GDS_DATE_RECORDS:
+            h.update(data[index:index + 4])
+        else:
+            h.update(data[index:index + size])
+        index += size
+
+
+def hash_file(h, file_name):
+    """ Add the contents of a file to the hash. """
+    with open(file_name, "rb") as f:
+        h.update(f.read())
+
+
+def hash_stat(h, file_name):
+    """ Add the size and modification time of a file to the hash. """
+    try:
+        stat = os.stat(file_name)
+        h.update("{0} {1} {2}\n".format(file_name, stat.st_size, stat.st_mtime_ns).encode())
+    except OSError:
+        h.update("{0} missing\n".format(file_name).encode())
+
+
+def get_tool_hash():
+    """
+    Return the hash of the technology and the DRC/LVS tools. The rule decks
+    may be in the tech directory or named by the technology and the netgen
+    setup file may be given by $OPENRAM_NETGENRC. The tool versions change
+    the executables.
+    """
+    from tech import drc
+    rule_files = [drc[rules] for rules in ["drc_rules", "lvs_rules", "xrc_rules"] if rules in drc and drc[rules]]
+    netgenrc = os.environ.get("OPENRAM_NETGENRC", None)
+    tools = "{0} {1} {2} {3} {4}\n".format(OPTS.tech_name, OPTS.drc_exe, OPTS.lvs_exe, rule_files, netgenrc)
+    if tools in tool_hashes:
+        return tool_hashes[tools]
+
+    h = hashlib.sha256()
+    h.update(tools.encode())
+    for exe in [OPTS.drc_exe, OPTS.lvs_exe]:
+        if exe:
+            hash_stat(h, exe[1])
+    for file_name in rule_files:
+        hash_stat(h, file_name)
+    if netgenrc:
+        hash_stat(h, netgenrc)
+    tech_dir = OPTS.openram_tech + "tech"
+    if os.path.isdir(tech_dir):
+        for name in sorted(os.listdir(tech_dir)):
+            hash_stat(h, os.path.join(tech_dir, name))
+    tool_hashes[tools] = h.hexdigest()
+    return tool_hashes[tools]
+
+
+def get_key(check, cell_name, gds_name, sp_name, options):
+    """ Return the cache key of a check of a cell. """
+    h = hashlib.sha256()
+    h.update(get_tool_hash().encode())
+    h.update("{0} {1} {2}\n".format(check, cell_name, sorted(options.items())).encode())
+    for name, hash_function in [(gds_name, hash_gds), (sp_name, hash_file)]:
+        # The tools run in the temp directory so the files may be relative to it
+        if name and not os.path.isabs(name):
+            name = OPTS.openram_temp + name
+        if name and os.path.isfile(name):
+            hash_function(h, name)
+    return h.hexdigest()
+
+
+def run_check(check, run_function, cell_name, gds_name, sp_name, **options):
+    """
+    Return the number of errors of a DRC or LVS check from the cache.
+    If it is not cached, call run_function and store its result.
+    """
+    if not OPTS.verify_cache:
+        return run_function(cell_name, gds_name, sp_name, **options)
+
+    key = get_key(check, cell_name, gds_name, sp_name, options)
+    result_file = os.path.join(OPTS.verify_cache, "{}.json".format(key))
+    try:
+        with open(result_file, "r") as f:
+            errors = json.load(f)["errors"]
+        debug.info(1, "{0}\t{1} errors {2} (cached)".format(cell_name, check.upper(), errors))
+        return errors
+    except (OSError, ValueError, KeyError):
+        pass
+
+    errors = run_function(cell_name, gds_name, sp_name, **options)
+
+    write_atomic(result_file, json.dumps({"cell": cell_name, "check": check, "errors": errors}).encode())
+    return errors
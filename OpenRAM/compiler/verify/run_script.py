@@ -11,18 +11,32 @@ Some baseline functions to run scripts.
 
 import os
 import debug
+import signal
 import subprocess
+import sys
+import threading
 import time
 from globals import OPTS
 
+# Seconds between the messages that a script is still running
+HEARTBEAT = 30
+
+
+def stream_output(pipe, output_file, echo_cmd_output):
+    """ Copy the output of a script to its file (and the terminal) while it runs. """
+    for line in iter(pipe.readline, b""):
+        output_file.write(line)
+        if echo_cmd_output:
+            sys.stdout.write(line.decode(errors="replace"))
+            sys.stdout.flush()
+    pipe.close()
+
 
 def run_script(cell_name, script="lvs"):
     """ Run script and create output files. """
 
     echo_cmd_output = OPTS.verbose_level > 1
 
-    cwd = os.getcwd()
-    os.chdir(OPTS.openram_temp)
     errfile = "{0}{1}.{2}.err".format(OPTS.openram_temp, cell_name, script)
     outfile = "{0}{1}.{2}.out".format(OPTS.openram_temp, cell_name, script)
     resultsfile = "{0}{1}.{2}.report".format(OPTS.openram_temp, cell_name, script)
@@ -32,46 +46,37 @@ def run_script(cell_name, script="lvs"):
     debug.info(2, "Starting {}".format(scriptpath))
     start = time.time()
     with open(outfile, 'wb') as fo, open(errfile, 'wb') as fe:
-        p = subprocess.Popen(
-                [scriptpath], stdout=fo, stderr=fe, cwd=OPTS.openram_temp)
+        # The script gets its own process group so a timeout also kills the tools it starts
+        p = subprocess.Popen([scriptpath],
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE,
+                             cwd=OPTS.openram_temp,
+                             start_new_session=True)
+        streams = [threading.Thread(target=stream_output, args=(p.stdout, fo, echo_cmd_output)),
+                   threading.Thread(target=stream_output, args=(p.stderr, fe, echo_cmd_output))]
+        for stream in streams:
+            stream.start()
 
-        if echo_cmd_output:
-            tailo = subprocess.Popen([
-                'tail',
-                '-f',                # Follow the output
-                '--pid', str(p.pid), # Close when this pid exits
-                outfile,
-            ])
-            taile = subprocess.Popen([
-                'tail',
-                '-f',                # Follow the output
-                '--pid', str(p.pid), # Close when this pid exits
-                errfile,
-            ])
-
-    lastoutput = start
-    while p.poll() == None:
-        runningfor = time.time() - start
-        outputdelta = time.time() - lastoutput
-        if outputdelta > 30:
-            lastoutput = time.time()
-            debug.info(1, "Still running {} ({:.0f} seconds)".format(scriptpath, runningfor))
-        time.sleep(1)
-    assert p.poll() != None, (p.poll(), p)
-    p.wait()
+        # Block until the script exits and only wake up for the heartbeat
+        while True:
+            timeout = HEARTBEAT
+            if OPTS.script_timeout:
+                timeout = max(0, min(timeout, start + OPTS.script_timeout - time.time()))
+            try:
+                p.wait(timeout=timeout)
+                break
+            except subprocess.TimeoutExpired:
+                runningfor = time.time() - start
+                if OPTS.script_timeout and runningfor >= OPTS.script_timeout:
+                    debug.warning("Killing {} after {:.0f} seconds".format(scriptpath, runningfor))
+                    os.killpg(p.pid, signal.SIGKILL)
+                    p.wait()
+                    break
+                debug.info(1, "Still running {} ({:.0f} seconds)".format(scriptpath, runningfor))
 
-    # Kill the tail commands if they haven't finished.
-    if echo_cmd_output:
-        if tailo.poll() != None:
-            tailo.kill()
-        tailo.wait()
-        if taile.poll() != None:
-            taile.kill()
-        taile.wait()
+        for stream in streams:
+            stream.join()
 
     debug.info(2, "Finished {} with {}".format(scriptpath, p.returncode))
 
-    os.chdir(cwd)
-
     return (outfile, errfile, resultsfile)
-